@@ -0,0 +1,152 @@
+import json
+from datetime import datetime
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context
+from flask.json import JSONEncoder
+
+from app_config import db
+from pagination import keyset_page, decode_cursor
+from queries import *
+
+
+class ApiJSONEncoder(JSONEncoder):
+    # ISO 8601 timestamps instead of Flask's default HTTP date strings
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+api = Blueprint('api', __name__)
+api.json_encoder = ApiJSONEncoder
+
+VENUE_FIELDS = ('id', 'name', 'city', 'state', 'num_upcoming_shows')
+ARTIST_FIELDS = ('id', 'name')
+SHOW_FIELDS = ('id', 'start_time', 'venue_id', 'venue_name', 'artist_id', 'artist_name', 'artist_image_link')
+
+VENUE_DETAIL_FIELDS = ('id', 'name', 'genres', 'address', 'city', 'state', 'phone', 'website', 'facebook_link',
+                       'seeking_talent', 'seeking_description', 'image_link', 'upcoming_shows', 'past_shows',
+                       'upcoming_shows_count', 'past_shows_count')
+ARTIST_DETAIL_FIELDS = ('id', 'name', 'genres', 'city', 'state', 'phone', 'website', 'facebook_link',
+                        'seeking_venue', 'seeking_description', 'image_link', 'upcoming_shows', 'past_shows',
+                        'upcoming_shows_count', 'past_shows_count')
+
+
+def selected_fields(available):
+    # ?fields=id,name trims every object to the named fields; unknown names are a client error
+    fields = request.args.get('fields')
+    if not fields:
+        return available
+    fields = tuple(field.strip() for field in fields.split(',') if field.strip())
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        abort(400, f'Unknown fields: {", ".join(unknown)}')
+    return fields
+
+
+def wants_ndjson():
+    return request.args.get('format') == 'ndjson' or \
+        request.accept_mimetypes.best == 'application/x-ndjson'
+
+
+def collection(query, order, fields):
+    """Serve a listing as a JSON page, or as NDJSON streamed from a server-side cursor.
+
+    Both forms start after the optional ``?after=`` cursor.  A JSON page carries the cursors of
+    its neighbours; an NDJSON stream runs to the end of the collection without holding it in memory.
+    """
+    if not wants_ndjson():
+        page = keyset_page(query, order,
+                           after=request.args.get('after'),
+                           before=request.args.get('before'),
+                           limit=request.args.get('limit'))
+        return jsonify({
+            "data": [{field: getattr(row, field) for field in fields} for row in page.rows],
+            "next": page.next_cursor,
+            "prev": page.prev_cursor,
+        })
+
+    after = decode_cursor(request.args.get('after'), order)
+    if after is not None:
+        query = query.filter(db.tuple_(*order) > db.tuple_(*after))
+    batch_size = current_app.config['API_STREAM_BATCH_SIZE']
+    rows = query.order_by(*order) \
+        .execution_options(stream_results=current_app.config['SQLALCHEMY_SERVER_SIDE_CURSORS']) \
+        .yield_per(batch_size)
+
+    def generate():
+        for row in rows:
+            yield json.dumps({field: getattr(row, field) for field in fields}, cls=ApiJSONEncoder) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def partition_shows(rows, show_fields):
+    now = datetime.utcnow()
+    upcoming_shows, past_shows = [], []
+    for row in rows:
+        if row.start_time is None:
+            continue
+        show = {field: getattr(row, field) for field in show_fields}
+        (upcoming_shows if row.start_time > now else past_shows).append(show)
+    return upcoming_shows, past_shows
+
+
+@api.route('/venues')
+def venues():
+    return collection(venue_listing_query(), VENUE_LISTING_ORDER, selected_fields(VENUE_FIELDS))
+
+
+@api.route('/artists')
+def artists():
+    return collection(artist_listing_query(), ARTIST_LISTING_ORDER, selected_fields(ARTIST_FIELDS))
+
+
+@api.route('/shows')
+def shows():
+    return collection(show_listing_query(), SHOW_LISTING_ORDER, selected_fields(SHOW_FIELDS))
+
+
+@api.route('/venues/<int:venue_id>')
+def venue(venue_id):
+    fields = selected_fields(VENUE_DETAIL_FIELDS)
+    rows = venue_detail_query(venue_id).all()
+    if not rows:
+        abort(404)
+
+    venue = rows[0].Venue
+    upcoming_shows, past_shows = partition_shows(rows, ('artist_id', 'artist_name', 'artist_image_link', 'start_time'))
+    data = {field: getattr(venue, field) for field in VENUE_DETAIL_FIELDS if hasattr(venue, field)}
+    data.update({
+        "upcoming_shows": upcoming_shows,
+        "upcoming_shows_count": len(upcoming_shows),
+        "past_shows": past_shows,
+        "past_shows_count": len(past_shows),
+    })
+    return jsonify({field: data[field] for field in fields})
+
+
+@api.route('/artists/<int:artist_id>')
+def artist(artist_id):
+    fields = selected_fields(ARTIST_DETAIL_FIELDS)
+    rows = artist_detail_query(artist_id).all()
+    if not rows:
+        abort(404)
+
+    artist = rows[0].Artist
+    upcoming_shows, past_shows = partition_shows(rows, ('venue_id', 'venue_name', 'venue_image_link', 'start_time'))
+    data = {field: getattr(artist, field) for field in ARTIST_DETAIL_FIELDS if hasattr(artist, field)}
+    data.update({
+        "upcoming_shows": upcoming_shows,
+        "upcoming_shows_count": len(upcoming_shows),
+        "past_shows": past_shows,
+        "past_shows_count": len(past_shows),
+    })
+    return jsonify({field: data[field] for field in fields})
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+    return jsonify({"error": error.description}), error.code
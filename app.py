@@ -3,32 +3,58 @@
 # ----------------------------------------------------------------------------#
 
 import logging
+import os
 import sys
+from datetime import datetime
+from functools import lru_cache
 from logging import Formatter, FileHandler
 
-import babel
-import dateutil.parser
-from flask import render_template, request, flash, redirect, url_for
+from flask import Blueprint, Flask, current_app, render_template, request, flash, redirect, url_for, abort, jsonify
 
-from app_config import *
-from forms import *
+from api import api
+from app_config import cache, db, init_extensions
+from bulk_import import IMPORTS, DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE, read_rows, import_rows
+from commands import init_commands
 from models import *
+from conditional import conditional, check_modified, latest
+from counters import count_shows, uncount_shows
+from metrics import init_metrics
+from pagination import keyset_page
+from pool import pool_status
+from queries import *
+from query_stats import init_query_stats, query_budget
+from replica import read_only
+from search import init_search, invalidate_search, search
+from sessions import init_sessions
 
 
 # ----------------------------------------------------------------------------#
 # Filters.
 # ----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale='en')
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
 
 
-app.jinja_env.filters['datetime'] = format_datetime
+@lru_cache(maxsize=64)
+def compiled_datetime_format(format, locale):
+    # Parsing the pattern and loading the locale data is the expensive part of formatting, and
+    # pages only ever use a handful of format/locale pairs.  babel is imported here, on the first
+    # page that formats a date, rather than by every process that imports the app.
+    from babel import Locale
+    from babel.dates import parse_pattern
+    return parse_pattern(DATETIME_FORMATS.get(format, format)), Locale.parse(locale)
+
+
+def format_datetime(value, format='medium', locale='en'):
+    # Routes pass datetime objects; strings are still accepted for callers that have not moved over
+    if isinstance(value, str):
+        import dateutil.parser
+        value = dateutil.parser.parse(value)
+    pattern, locale = compiled_datetime_format(format, locale)
+    return pattern.apply(value, locale)
 
 
 # Filter for seeking_talent field
@@ -39,171 +65,236 @@ def format_boolean_field(boolean):
         return True
 
 
-# ----------------------------------------------------------------------------#
-# Controllers.
-# ----------------------------------------------------------------------------#
+# Cache tag covering the area listing pages that show venues in this city
+def area_tag(city, state):
+    return f'area:{state}:{city}'
 
-@app.route('/')
-def index():
-    return render_template('pages/home.html')
 
+# Detail page context of a venue or artist row and its already partitioned shows
+def venue_details(venue, upcoming_shows, past_shows):
+    venue_object = {
+        "id": venue.id,
+        "name": venue.name,
+        "address": venue.address,
+        "city": venue.city,
+        "state": venue.state,
+        "phone": venue.phone,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link,
+        "upcoming_shows": upcoming_shows,
+        "upcoming_shows_count": len(upcoming_shows),
+        "past_shows": past_shows,
+        "past_shows_count": len(past_shows)
+    }
 
-#  Venues
-#  ----------------------------------------------------------------
+    # The below categories are optional and therefore checked for NoneType before updating to the dictionary
+    if venue.genres is not None:
+        venue_object.update({"genres": venue.genres})
+    if venue.website is not None:
+        venue_object.update({"website": venue.website})
+    if venue.seeking_description is not None:
+        venue_object.update({"seeking_description": venue.seeking_description})
 
-@app.route('/venues')
-def venues():
-    venues_query = Venue.query.all()
+    return venue_object
 
-    venues_array = []
 
-    for venue in venues_query:
-        venue_dictionary = next((item for item in venues_array
-                                 if item["city"] == venue.city and item["state"] == venue.state), None)
-        venue_dictionary_index = next((i for i, item in enumerate(venues_array)
-                                       if item["city"] == venue.city and item["state"] == venue.state), None)
+def artist_details(artist, upcoming_shows, past_shows):
+    return {
+        "id": artist.id,
+        "name": artist.name,
+        "genres": artist.genres,
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description": artist.seeking_description,
+        "website": artist.website,
+        "facebook_link": artist.facebook_link,
+        "image_link": artist.image_link,
+        "upcoming_shows": upcoming_shows,
+        "upcoming_shows_count": len(upcoming_shows),
+        "past_shows": past_shows,
+        "past_shows_count": len(past_shows)
+    }
 
-        upcoming_shows = db.session.query(Show) \
-            .filter(Show.venue_id == venue.id and venue.shows.start_time > datetime.utcnow()).all()
 
-        if venue_dictionary is None:
+def venue_page(venue, show_rows):
+    """Render a venue's page from its row and its shows' rows, each with its artist's columns.
 
-            new_venue = {
-                "city": venue.city,
-                "state": venue.state,
-                "venues": [{
-                    "id": venue.id,
-                    "name": venue.name,
-                    "num_upcoming_shows": len(upcoming_shows),
-                }]
-            }
+    Shared by the view and asgi.py, which fetch the rows differently; a show row whose ``start_time``
+    is None stands for no show at all.
+    """
+    # Past and upcoming shows are partitioned in a single pass over the rows
+    now = datetime.utcnow()
+    upcoming_shows_list = []
+    past_shows_list = []
+    shows_version = []
+    last_modified = venue.updated_at
+    for show in show_rows:
+        if show.start_time is None:
+            continue
+
+        data = {
+            "artist_id": show.artist_id,
+            "artist_name": show.artist_name,
+            "artist_image_link": show.artist_image_link,
+            "start_time": show.start_time
+        }
+        cache.tag(f'artist:{show.artist_id}')
+        shows_version.append((show.start_time, show.show_updated_at, show.artist_id, show.artist_updated_at))
+        last_modified = latest(last_modified, show.show_updated_at, show.artist_updated_at)
 
-            venues_array.append(new_venue)
+        if show.start_time > now:
+            upcoming_shows_list.append(data)
         else:
-            new_venue = {
-                "id": venue.id,
-                "name": venue.name,
-                "num_upcoming_shows": len(upcoming_shows),
-            }
-            venue_dictionary["venues"].append(new_venue)
+            past_shows_list.append(data)
+            # The page last changed no earlier than when its latest past show moved out of upcoming
+            last_modified = latest(last_modified, show.start_time)
 
-            venues_array[venue_dictionary_index] = venue_dictionary
+    check_modified((venue.id, venue.updated_at, shows_version, len(upcoming_shows_list)), last_modified)
 
-    return render_template('pages/venues.html', areas=venues_array)
+    return render_template('pages/show_venue.html', venue=venue_details(venue, upcoming_shows_list, past_shows_list))
 
 
-@app.route('/venues/search', methods=['POST'])
-def search_venues():
-    search_term = request.form.get('search_term', '')
+def artist_page(artist, show_rows):
+    """Render an artist's page from its row and its shows' rows, each with its venue's columns."""
+    now = datetime.utcnow()
+    upcoming_shows_list = []
+    past_shows_list = []
+    shows_version = []
+    last_modified = artist.updated_at
+    for show in show_rows:
+        if show.start_time is None:
+            continue
 
-    venues_query = db.session.query(Venue).filter(Venue.name.ilike("%" + search_term + "%")).all()
+        data = {
+            "venue_id": show.venue_id,
+            "venue_name": show.venue_name,
+            "venue_image_link": show.venue_image_link,
+            "start_time": show.start_time
+        }
+        cache.tag(f'venue:{show.venue_id}')
+        shows_version.append((show.start_time, show.show_updated_at, show.venue_id, show.venue_updated_at))
+        last_modified = latest(last_modified, show.show_updated_at, show.venue_updated_at)
 
-    venues_array = []
-    for venue in venues_query:
-        upcoming_shows = db.session.query(Show) \
-            .filter(Show.venue_id == venue.id, Show.start_time > datetime.utcnow()).all()
+        if show.start_time > now:
+            upcoming_shows_list.append(data)
+        else:
+            past_shows_list.append(data)
+            last_modified = latest(last_modified, show.start_time)
 
-        new_venue = {
-            "id": venue.id,
-            "name": venue.name,
-            "num_upcoming_shows": len(upcoming_shows),
-        }
-        venues_array.append(new_venue)
+    check_modified((artist.id, artist.updated_at, shows_version, len(upcoming_shows_list)), last_modified)
 
-    response = {
-        "count": len(venues_array),
-        "data": venues_array
-    }
+    return render_template('pages/show_artist.html', artist=artist_details(artist, upcoming_shows_list, past_shows_list))
 
-    return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
+# ----------------------------------------------------------------------------#
+# Controllers.
+# ----------------------------------------------------------------------------#
 
-@app.route('/venues/<int:venue_id>')
-def show_venue(venue_id):
-    # Filtering using a query instead of the lambda filter.  Reduces the number of items that are returned.
-    venue = db.session.query(Venue).filter(Venue.id == venue_id).first()
-    venue_dictionary = {}
+main = Blueprint('main', __name__)
 
-    # The for loops are necessary in order to put the start_time in a string format
-    upcoming_shows = db.session.query(Show) \
-        .filter(Show.venue_id == venue.id, Show.start_time > datetime.utcnow()).all()
 
-    upcoming_shows_list = []
-    for show in upcoming_shows:
-        data = {
-            "artist_id": show.artist_id,
-            "artist_name": show.artist_show.name,
-            "artist_image_link": show.artist_show.image_link,
-            "start_time": f"{show.start_time}"
-        }
+@main.route('/')
+def index():
+    return render_template('pages/home.html')
 
-        upcoming_shows_list.append(data)
 
-    past_shows = db.session.query(Show) \
-        .filter(Show.venue_id == venue.id, Show.start_time < datetime.utcnow()).all()
+#  Venues
+#  ----------------------------------------------------------------
 
-    past_shows_list = []
-    for show in past_shows:
-        data = {
-            "artist_id": show.artist_id,
-            "artist_name": show.artist_show.name,
-            "artist_image_link": show.artist_show.image_link,
-            "start_time": f"{show.start_time}"
-        }
+@main.route('/venues')
+@query_budget(2)
+@cache.cached('venues')
+@conditional
+def venues():
+    venues_query = venue_listing_query()
+
+    # Venues are paged in (state, city, id) order so the venues of an area stay contiguous
+    page = keyset_page(venues_query, VENUE_LISTING_ORDER,
+                       after=request.args.get('after'),
+                       before=request.args.get('before'),
+                       limit=request.args.get('limit'))
+
+    # Upcoming counts also change as shows start, so the page is versioned by its counts as well as
+    # by the venue rows rather than given a Last-Modified date.  The cursors are part of the version
+    # too: the same rows gain a next link once venues are added after them.
+    check_modified(([(venue.id, venue.updated_at, venue.num_upcoming_shows) for venue in page.rows],
+                    page.next_cursor, page.prev_cursor))
+
+    # Areas are keyed by (city, state) so each venue is grouped with a single dictionary lookup
+    areas = {}
+    for venue in page.rows:
+        area = areas.get((venue.city, venue.state))
+        if area is None:
+            area = {
+                "city": venue.city,
+                "state": venue.state,
+                "venues": []
+            }
+            areas[(venue.city, venue.state)] = area
+            cache.tag(area_tag(venue.city, venue.state))
 
-        past_shows_list.append(data)
+        area["venues"].append({
+            "id": venue.id,
+            "name": venue.name,
+            "num_upcoming_shows": venue.num_upcoming_shows,
+        })
 
-    venue_object = {
-        "id": venue.id,
-        "name": venue.name,
-        "address": venue.address,
-        "city": venue.city,
-        "state": venue.state,
-        "phone": venue.phone,
-        "facebook_link": venue.facebook_link,
-        "seeking_talent": venue.seeking_talent,
-        "seeking_description": venue.seeking_description,
-        "image_link": venue.image_link,
-        "upcoming_shows": upcoming_shows_list,
-        "upcoming_shows_count": len(upcoming_shows),
-        "past_shows": past_shows_list,
-        "past_shows_count": len(past_shows)
+    return render_template('pages/venues.html', areas=list(areas.values()), page=page)
+
+
+@main.route('/venues/search', methods=['POST'])
+@read_only
+@query_budget(2)
+def search_venues():
+    search_term = request.form.get('search_term', '')
+
+    results = search(Venue, search_term)
+
+    response = {
+        "count": results.count,
+        "data": results.data
     }
 
-    # The below categories are optional and therefore checked for NoneType before updating to the dictionary
-    if venue.genres is not None:
-        venue_object.update({"genres": venue.genres})
-    if venue.website is not None:
-        venue_object.update({"website": venue.website})
-    if venue.seeking_description is not None:
-        venue_object.update({"seeking_description": venue.seeking_description})
+    return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+
+@main.route('/venues/<int:venue_id>')
+@query_budget(2)
+@cache.cached('venue:{venue_id}')
+@conditional
+def show_venue(venue_id):
+    venue_rows = venue_detail_query(venue_id).all()
 
-    venue_dictionary.update(venue_object)
+    if not venue_rows:
+        abort(404)
 
-    return render_template('pages/show_venue.html', venue=venue_dictionary)
+    return venue_page(venue_rows[0].Venue, venue_rows)
 
 
 #  Create Venue
 #  ----------------------------------------------------------------
 
-@app.route('/venues/create', methods=['GET'])
+@main.route('/venues/create', methods=['GET'])
 def create_venue_form():
+    from forms import VenueForm
     form = VenueForm()
     return render_template('forms/new_venue.html', form=form)
 
 
-@app.route('/venues/create', methods=['POST'])
+@main.route('/venues/create', methods=['POST'])
 def create_venue_submission():
     form_input = request.form
 
     error = False
     try:
-        max_id = db.session.query(db.func.max(Venue.id)).scalar()
         new_venue = Venue(
-            id=1 if max_id is None else max_id + 1,
             name=form_input.get("name"),
-            city=form_input.get("city"),
-            state=form_input.get("state"),
+            city=form_input.get("city", ""),
+            state=form_input.get("state", ""),
             address=form_input.get("address"),
             phone=form_input.get("phone"),
             website=form_input.get("website"),
@@ -222,6 +313,8 @@ def create_venue_submission():
     finally:
         db.session.close()
     if not error:
+        # A new venue can land on any page of the area listing
+        cache.invalidate('venues', 'choices:venues')
         # on successful db insert, flash success
         flash('Venue ' + request.form['name'] + ' was successfully listed!')
     else:
@@ -230,128 +323,109 @@ def create_venue_submission():
     return render_template('pages/home.html')
 
 
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+@main.route('/venues/<int:venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
+    venue_area = db.session.query(Venue.city, Venue.state).filter(Venue.id == venue_id, LIVE_VENUE).first()
+    if venue_area is None:
+        return jsonify({"error": "Venue not found"}), 404
 
-    venue_query = db.session.query(Venue).filter(Venue.id == venue_id).first()
+    error = False
+    scheduled = False
     try:
-        db.session.delete(venue_query)
+        # The venue's shows come off its artists' counters whichever way the venue goes
+        uncount_shows(Show.venue_id == venue_id)
+        show_count = db.session.query(db.func.count(Show.id)).filter(Show.venue_id == venue_id).scalar()
+        if show_count > current_app.config['VENUE_DELETE_INLINE_SHOWS']:
+            # Hidden straight away; `flask purge-venues` deletes the rows in batches later
+            db.session.query(Venue).filter(Venue.id == venue_id) \
+                .update({Venue.deleted_at: datetime.utcnow()}, synchronize_session=False)
+            scheduled = True
+        else:
+            # ON DELETE CASCADE removes the shows inside the database, without loading them
+            db.session.execute(Venue.__table__.delete().where(Venue.id == venue_id))
         db.session.commit()
+        # Neither the soft delete nor the Core delete fires ORM events
+        invalidate_search(Venue)
+        cache.invalidate('venues', 'shows', f'venue:{venue_id}', 'choices:venues', area_tag(*venue_area))
     except:
         db.session.rollback()
         print(sys.exc_info())
+        error = True
     finally:
         db.session.close()
 
-    return None
+    if error:
+        return jsonify({"error": "Venue could not be deleted"}), 500
+    if scheduled:
+        return jsonify({"id": venue_id, "status": "scheduled"}), 202
+    return '', 204
 
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
+@main.route('/artists')
+@query_budget(2)
+@cache.cached('artists')
+@conditional
 def artists():
-    artist_query = Artist.query.all()
+    artist_query = artist_listing_query()
+
+    page = keyset_page(artist_query, ARTIST_LISTING_ORDER,
+                       after=request.args.get('after'),
+                       before=request.args.get('before'),
+                       limit=request.args.get('limit'))
+
+    # No Last-Modified: the page also changes when its rows do not, as it gains a next or previous link
+    check_modified(([(artist.id, artist.updated_at) for artist in page.rows], page.next_cursor, page.prev_cursor))
 
     artist_list = []
-    for artist in artist_query:
+    for artist in page.rows:
         artist_object = {
             "id": artist.id,
             "name": artist.name,
         }
 
         artist_list.append(artist_object)
+        cache.tag(f'artist:{artist.id}')
 
-    return render_template('pages/artists.html', artists=artist_list)
+    return render_template('pages/artists.html', artists=artist_list, page=page)
 
 
-@app.route('/artists/search', methods=['POST'])
+@main.route('/artists/search', methods=['POST'])
+@read_only
+@query_budget(2)
 def search_artists():
     search_term = request.form.get('search_term', '')
 
-    artists_query = db.session.query(Artist).filter(Artist.name.ilike("%" + search_term + "%")).all()
-
-    artists_array = []
-    for artist in artists_query:
-        upcoming_shows = db.session.query(Show) \
-            .filter(Show.artist_id == artist.id, Show.start_time > datetime.utcnow()).all()
-
-        new_artist = {
-            "id": artist.id,
-            "name": artist.name,
-            "num_upcoming_shows": len(upcoming_shows),
-        }
-        artists_array.append(new_artist)
+    results = search(Artist, search_term)
 
     response = {
-        "count": len(artists_array),
-        "data": artists_array
+        "count": results.count,
+        "data": results.data
     }
 
     return render_template('pages/search_artists.html', results=response,
                            search_term=search_term)
 
 
-@app.route('/artists/<int:artist_id>')
+@main.route('/artists/<int:artist_id>')
+@query_budget(2)
+@cache.cached('artist:{artist_id}')
+@conditional
 def show_artist(artist_id):
-    artist = db.session.query(Artist).filter(Artist.id == artist_id).first()
-
-    upcoming_shows = db.session.query(Show) \
-        .filter(Show.artist_id == artist.id, Show.start_time > datetime.utcnow()).all()
-
-    upcoming_shows_list = []
-    for show in upcoming_shows:
-        data = {
-            "venue_id": show.venue_id,
-            "venue_name": show.venue_show.name,
-            "venue_image_link": show.venue_show.image_link,
-            "start_time": f"{show.start_time}"
-        }
-
-        upcoming_shows_list.append(data)
-
-    past_shows = db.session.query(Show) \
-        .filter(Show.artist_id == artist.id, Show.start_time < datetime.utcnow()).all()
-
-    past_shows_list = []
-    for show in past_shows:
-        data = {
-            "venue_id": show.venue_id,
-            "venue_name": show.venue_show.name,
-            "venue_image_link": show.venue_show.image_link,
-            "start_time": f"{show.start_time}"
-        }
-
-        past_shows_list.append(data)
-
-    artist_dictionary = {}
-
-    artist_object = {
-        "id": artist.id,
-        "name": artist.name,
-        "genres": artist.genres,
-        "city": artist.city,
-        "state": artist.state,
-        "phone": artist.phone,
-        "seeking_venue": artist.seeking_venue,
-        "seeking_description": artist.seeking_description,
-        "website": artist.website,
-        "facebook_link": artist.facebook_link,
-        "image_link": artist.image_link,
-        "upcoming_shows": upcoming_shows_list,
-        "upcoming_shows_count": len(upcoming_shows_list),
-        "past_shows": past_shows_list,
-        "past_shows_count": len(past_shows_list)
-    }
+    artist_rows = artist_detail_query(artist_id).all()
 
-    artist_dictionary.update(artist_object)
+    if not artist_rows:
+        abort(404)
 
-    return render_template('pages/show_artist.html', artist=artist_dictionary)
+    return artist_page(artist_rows[0].Artist, artist_rows)
 
 
 #  Update
 #  ----------------------------------------------------------------
-@app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@main.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
+    from forms import ArtistForm
     form = ArtistForm()
     artist_query = db.session.query(Artist).filter(Artist.id == artist_id).first()
 
@@ -372,7 +446,7 @@ def edit_artist(artist_id):
     return render_template('forms/edit_artist.html', form=form, artist=artist)
 
 
-@app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@main.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
     artist = db.session.query(Artist).filter(Artist.id == artist_id).first()
     edited_artist = request.form
@@ -396,15 +470,18 @@ def edit_artist_submission(artist_id):
     finally:
         db.session.close()
     if error is False:
+        # Covers the artist's page, the listing page and every show and venue page that lists it
+        cache.invalidate(f'artist:{artist_id}', 'choices:artists')
         flash('Artist ' + edited_artist.get("name") + ' was successfully changed!')
     else:
         flash('An error occurred. Artist ' + edited_artist.get("name") + ' could not be changed.')
 
-    return redirect(url_for('show_artist', artist_id=artist_id))
+    return redirect(url_for('.show_artist', artist_id=artist_id))
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@main.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
+    from forms import VenueForm
     form = VenueForm()
 
     venue_query = db.session.query(Venue).filter(Venue.id == venue_id).first()
@@ -427,15 +504,16 @@ def edit_venue(venue_id):
     return render_template('forms/edit_venue.html', form=form, venue=venue)
 
 
-@app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@main.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
     venue = Venue.query.get(venue_id)
     edited_venue = request.form
+    old_area = (venue.city, venue.state)
     error = False
     try:
         venue.name = edited_venue.get("name")
-        venue.city = edited_venue.get("city")
-        venue.state = edited_venue.get("state")
+        venue.city = edited_venue.get("city", "")
+        venue.state = edited_venue.get("state", "")
         venue.address = edited_venue.get("address")
         venue.phone = edited_venue.get("phone")
         venue.website = edited_venue.get("website")
@@ -452,30 +530,37 @@ def edit_venue_submission(venue_id):
     finally:
         db.session.close()
     if error is False:
+        # Covers the venue's page and every show and artist page that lists it
+        cache.invalidate(f'venue:{venue_id}', 'choices:venues')
+        new_area = (edited_venue.get("city", ""), edited_venue.get("state", ""))
+        if new_area == old_area:
+            cache.invalidate(area_tag(*old_area))
+        else:
+            # Moving to another area shifts the venue to another position in the listing
+            cache.invalidate('venues')
         flash('Venue ' + edited_venue.get("name") + ' was successfully listed!')
     else:
         flash('An error occurred. Venue ' + edited_venue.get("name") + ' could not be listed.')
-    return redirect(url_for('show_venue', venue_id=venue_id))
+    return redirect(url_for('.show_venue', venue_id=venue_id))
 
 
 #  Create Artist
 #  ----------------------------------------------------------------
 
-@app.route('/artists/create', methods=['GET'])
+@main.route('/artists/create', methods=['GET'])
 def create_artist_form():
+    from forms import ArtistForm
     form = ArtistForm()
     return render_template('forms/new_artist.html', form=form)
 
 
-@app.route('/artists/create', methods=['POST'])
+@main.route('/artists/create', methods=['POST'])
 def create_artist_submission():
     form_input = request.form
 
     error = False
     try:
-        max_id = db.session.query(db.func.max(Artist.id)).scalar()
         new_artist = Artist(
-            id=1 if max_id is None else max_id + 1,
             name=form_input.get("name"),
             city=form_input.get("city"),
             state=form_input.get("state"),
@@ -496,6 +581,7 @@ def create_artist_submission():
     finally:
         db.session.close()
     if error is False:
+        cache.invalidate('artists', 'choices:artists')
         # on successful db insert, flash success
         flash('Artist ' + request.form['name'] + ' was successfully listed!')
     else:
@@ -507,50 +593,86 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
-@app.route('/shows')
+@main.route('/shows')
+@query_budget(2)
+@cache.cached('shows')
+@conditional
 def shows():
-    show_query = Show.query.all()
+    show_query = show_listing_query()
+
+    page = keyset_page(show_query, SHOW_LISTING_ORDER,
+                       after=request.args.get('after'),
+                       before=request.args.get('before'),
+                       limit=request.args.get('limit'))
+
+    # Versioned like the artists page, by its rows and its links
+    shows_version = [(show.id, show.updated_at, show.venue_updated_at, show.artist_updated_at) for show in page.rows]
+    check_modified((shows_version, page.next_cursor, page.prev_cursor))
 
     shows_list = []
-    for show in show_query:
+    for show in page.rows:
         data = {
             "venue_id": show.venue_id,
-            "venue_name": show.venue_show.name,
+            "venue_name": show.venue_name,
             "artist_id": show.artist_id,
-            "artist_name": show.artist_show.name,
-            "artist_image_link": show.artist_show.image_link,
-            "start_time": f"{show.start_time}"
+            "artist_name": show.artist_name,
+            "artist_image_link": show.artist_image_link,
+            "start_time": show.start_time
         }
 
         shows_list.append(data)
+        cache.tag(f'venue:{show.venue_id}', f'artist:{show.artist_id}')
+
+    return render_template('pages/shows.html', shows=shows_list, page=page)
 
-    return render_template('pages/shows.html', shows=shows_list)
 
+def name_choices(model, kind):
+    # One row past the inline limit tells the form to switch to autocomplete without counting the table
+    limit = current_app.config['SHOW_FORM_INLINE_CHOICES']
+    return cache.value(f'choices:{kind}',
+                       lambda: [(row.id, row.name) for row in name_choices_query(model).limit(limit + 1)],
+                       f'choices:{kind}')
 
-@app.route('/shows/create')
+
+@main.route('/shows/create')
+@query_budget(3)
 def create_shows():
-    artist = db.session.query(Artist).all()
-    venue = db.session.query(Venue).all()
+    from forms import ShowForm
     form = ShowForm()
-    form.artist_id.choices = [(a.id, a.name) for a in artist]
-    form.venue_id.choices = [(v.id, v.name) for v in venue]
-    return render_template('forms/new_show.html', form=form)
 
+    # Small catalogs are embedded in the selects; larger ones are fetched by the page as the user types
+    autocomplete = {}
+    for field, model, kind in ((form.artist_id, Artist, 'artists'), (form.venue_id, Venue, 'venues')):
+        choices = name_choices(model, kind)
+        if len(choices) > current_app.config['SHOW_FORM_INLINE_CHOICES']:
+            field.choices = []
+            autocomplete[field.name] = url_for('.autocomplete', kind=kind)
+        else:
+            field.choices = choices
 
-@app.route('/shows/create', methods=['POST'])
+    return render_template('forms/new_show.html', form=form, autocomplete=autocomplete)
+
+
+@main.route('/shows/create', methods=['POST'])
 def create_show_submission():
+    import dateutil.parser
+
     form_input = request.form
     error = False
     try:
-        max_id = db.session.query(db.func.max(Show.id)).scalar()
         new_show = Show(
-            id=1 if max_id is None else max_id + 1,
-            venue_id=form_input.get("venue_id"),
-            artist_id=form_input.get("artist_id"),
-            start_time=form_input.get("start_time")
+            venue_id=int(form_input.get("venue_id")),
+            artist_id=int(form_input.get("artist_id")),
+            start_time=dateutil.parser.parse(form_input.get("start_time"))
         )
         db.session.add(new_show)
+        count_shows([(new_show.venue_id, new_show.artist_id, new_show.start_time)])
         db.session.commit()
+
+        # The new show changes its venue's upcoming count in the area listing
+        venue_area = db.session.query(Venue.city, Venue.state).filter(Venue.id == new_show.venue_id).one()
+        cache.invalidate('shows', f'venue:{new_show.venue_id}', f'artist:{new_show.artist_id}',
+                         area_tag(*venue_area))
     except:
         db.session.rollback()
         print(sys.exc_info())
@@ -565,37 +687,127 @@ def create_show_submission():
     return render_template('pages/home.html')
 
 
-@app.errorhandler(404)
+#  Autocomplete
+#  ----------------------------------------------------------------
+
+AUTOCOMPLETE_MODELS = {
+    'artists': Artist,
+    'venues': Venue,
+}
+
+
+# Not page cached: every prefix typed would be its own entry, pushing the listing and detail pages out
+# of the LRU, and the prefix query is a short index range scan
+@main.route('/autocomplete/<kind>')
+def autocomplete(kind):
+    model = AUTOCOMPLETE_MODELS.get(kind)
+    if model is None:
+        abort(404)
+
+    prefix = request.args.get('q', '').strip()
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    rows = name_prefix_query(model, prefix).limit(limit).all() if prefix else []
+
+    return jsonify({"data": [{"id": row.id, "name": row.name} for row in rows]})
+
+
+#  Bulk import
+#  ----------------------------------------------------------------
+
+@main.route('/import/<kind>', methods=['POST'])
+def import_upload(kind):
+    if kind not in IMPORTS:
+        abort(404)
+
+    # Either a multipart upload in the "file" field or the raw request body
+    upload = request.files.get('file')
+    if upload is not None:
+        stream, filename, mimetype = upload.stream, upload.filename or '', upload.mimetype
+    else:
+        stream, filename, mimetype = request.stream, '', request.mimetype
+
+    file_format = request.args.get('format')
+    if file_format is None:
+        file_format = 'csv' if mimetype == 'text/csv' or filename.lower().endswith('.csv') else 'ndjson'
+    if file_format not in ('csv', 'ndjson'):
+        abort(400)
+
+    try:
+        chunk_size = int(request.args.get('chunk_size', DEFAULT_CHUNK_SIZE))
+    except ValueError:
+        abort(400)
+    if not 1 <= chunk_size <= MAX_CHUNK_SIZE:
+        abort(400)
+
+    try:
+        report = import_rows(kind, read_rows(stream, file_format), chunk_size=chunk_size)
+    finally:
+        # Batches committed before any failure are already live
+        cache.clear()
+
+    return jsonify(report.as_dict()), 200 if not report.rejected else 422
+
+
+@main.route('/cache/stats')
+def cache_stats():
+    return jsonify(cache.stats())
+
+
+@main.route('/pool/stats')
+def pool_stats():
+    return jsonify(pool_status(db.engine))
+
+
+@main.app_errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
 
 
-@app.errorhandler(500)
+@main.app_errorhandler(500)
 def server_error(error):
     return render_template('errors/500.html'), 500
 
 
-if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
-    app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.info('errors')
+# ----------------------------------------------------------------------------#
+# App.
+# ----------------------------------------------------------------------------#
+
+def create_app(config='config'):
+    app = Flask(__name__)
+    app.config.from_object(config)
+
+    init_extensions(app)
+    init_sessions(app)
+    init_query_stats(app)
+    init_metrics(app)
+    init_search(app)
+    init_commands(app)
+
+    app.jinja_env.filters['datetime'] = format_datetime
+    app.register_blueprint(main)
+    app.register_blueprint(api, url_prefix='/api/v1')
+
+    if not app.debug:
+        app.logger.setLevel(logging.INFO)
+        # Without ERROR_LOG, Flask's default handler logs to stderr, which gunicorn collects.  Apps
+        # created in the same process share the logger, so the file handler is only added once.
+        path = app.config['ERROR_LOG'] and os.path.abspath(app.config['ERROR_LOG'])
+        if path and not any(getattr(handler, 'baseFilename', None) == path for handler in app.logger.handlers):
+            file_handler = FileHandler(path)
+            file_handler.setFormatter(
+                Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
+            )
+            file_handler.setLevel(logging.INFO)
+            app.logger.addHandler(file_handler)
+        app.logger.info('errors')
+
+    return app
 
 # ----------------------------------------------------------------------------#
 # Launch.
 # ----------------------------------------------------------------------------#
 
-# Default port:
-if __name__ == '__main__':
-    app.run()
-
-# Or specify port manually:
-'''
+# Development server; production runs under gunicorn (see wsgi.py and gunicorn.conf.py)
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
-'''
+    create_app().run(host=os.environ.get('HOST', '127.0.0.1'), port=port)
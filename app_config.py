@@ -1,11 +1,30 @@
-from flask import Flask
-from flask_migrate import Migrate
+import os
+
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 
-app = Flask(__name__)
-moment = Moment(app)
-app.config.from_object('config')
-db = SQLAlchemy(app)
+from cache import PageCache
+from pool import init_pool
+from replica import RoutingSQLAlchemy, init_replica
+
+# Created unbound so models and helpers can import them; create_app() in app.py binds them to an app
+moment = Moment()
+db = RoutingSQLAlchemy()
+cache = PageCache()
+
+
+def init_extensions(app):
+    moment.init_app(app)
+    # Engine options and binds are read from the config when db is bound
+    init_pool(app)
+    init_replica(app)
+    db.init_app(app)
+    cache.init_app(app)
+
+    # Only the `flask` command (for `flask db ...`) needs the migrations, so web workers never load alembic
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        init_migrate(app)
+
 
-migrate = Migrate(app, db)
\ No newline at end of file
+def init_migrate(app):
+    from flask_migrate import Migrate
+    Migrate(app, db)
@@ -0,0 +1,251 @@
+"""ASGI entry point serving the read-heavy pages with async SQLAlchemy.
+
+Venue and artist detail pages and the Postgres trigram searches run here on an async engine, with
+independent queries issued concurrently; every other request is handed to the WSGI ``app``, as are
+visitors with a session or the read-your-writes cookie.  Once the rows are in, the page is built by
+the same request pipeline as under WSGI: the before and after request hooks (metrics, query budget,
+replica routing, session), :func:`conditional.check_modified` and the page cache.
+Run with e.g. ``uvicorn asgi:application``.
+"""
+import asyncio
+import os
+import re
+import time
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi
+from flask import abort, g, render_template, request
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from werkzeug.http import parse_cookie
+
+from app import create_app, venue_page, artist_page
+from app_config import cache, db
+from cache import page_key
+from conditional import conditional
+from models import Venue, Artist
+from queries import LIVE_VENUE, venue_shows_query, artist_shows_query
+from replica import STICKY_COOKIE
+from search import PostgresTrigramSearch, search_backend
+
+# Sync driver -> asyncio driver for the same database
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_engine(config, root_path):
+    # Requests served here only read, and visitors who just wrote are handed to the WSGI app, so the
+    # replica is used when there is one
+    url = make_url(config['DATABASE_REPLICA_URL'] or config['SQLALCHEMY_DATABASE_URI'])
+    backend = url.get_backend_name()
+    url = url.set(drivername=ASYNC_DRIVERS.get(backend, url.drivername))
+
+    options = {}
+    if backend == 'sqlite':
+        # Relative paths resolve against the app like Flask-SQLAlchemy's
+        if url.database and url.database != ':memory:':
+            url = url.set(database=os.path.join(root_path, url.database))
+    elif config['DATABASE_PGBOUNCER']:
+        # asyncpg prepares every statement server side, which PgBouncer's transaction mode cannot keep
+        options.update(poolclass=NullPool, connect_args={'statement_cache_size': 0})
+    else:
+        options.update(pool_size=config['DATABASE_POOL_SIZE'],
+                       max_overflow=config['DATABASE_MAX_OVERFLOW'],
+                       pool_timeout=config['DATABASE_POOL_TIMEOUT'],
+                       pool_recycle=config['DATABASE_POOL_RECYCLE'],
+                       pool_pre_ping=config['DATABASE_POOL_PRE_PING'])
+        if config['DATABASE_STATEMENT_TIMEOUT']:
+            options['connect_args'] = {
+                'server_settings': {'statement_timeout': str(config['DATABASE_STATEMENT_TIMEOUT'])}
+            }
+    return create_async_engine(url, **options)
+
+
+app = create_app()
+engine = async_engine(app.config, app.root_path)
+wsgi_application = WsgiToAsgi(app)
+
+
+async def fetch_all(statement):
+    # One connection per statement, so statements gathered together run concurrently
+    async with engine.connect() as connection:
+        return (await connection.execute(statement)).all()
+
+
+def request_context(scope, body=b''):
+    """A Flask request context for the ASGI request.
+
+    Flask 1.1 keeps its context stacks per thread, not per task, so a context must never be held
+    across an ``await``; each one is pushed and popped within one call on a worker thread.
+    """
+    return app.test_request_context(
+        scope['path'],
+        method=scope['method'],
+        query_string=scope['query_string'],
+        headers=[(name.decode('latin-1'), value.decode('latin-1')) for name, value in scope['headers']],
+        data=body)
+
+
+def venue_statements(venue_id):
+    return [db.select(Venue).where(Venue.id == venue_id, LIVE_VENUE), venue_shows_query(venue_id).statement]
+
+
+@cache.cached('venue:{venue_id}')
+@conditional
+def show_venue(rows, venue_id):
+    venue_rows, show_rows = rows
+    if not venue_rows:
+        abort(404)
+    return venue_page(venue_rows[0], show_rows)
+
+
+def artist_statements(artist_id):
+    return [db.select(Artist).where(Artist.id == artist_id), artist_shows_query(artist_id).statement]
+
+
+@cache.cached('artist:{artist_id}')
+@conditional
+def show_artist(rows, artist_id):
+    artist_rows, show_rows = rows
+    if not artist_rows:
+        abort(404)
+    return artist_page(artist_rows[0], show_rows)
+
+
+def search_statements(model):
+    def statements():
+        search_term = request.form.get('search_term', '')
+        return [search_backend().query(model, search_term, app.config['SEARCH_RESULT_LIMIT']).statement]
+    return statements
+
+
+def search_view(template):
+    def view(rows):
+        results = search_backend().results(rows[0])
+        response = {
+            "count": results.count,
+            "data": results.data
+        }
+        return render_template(template, results=response, search_term=request.form.get('search_term', ''))
+    return view
+
+
+def trigram_search_enabled():
+    with app.app_context():
+        return isinstance(search_backend(), PostgresTrigramSearch)
+
+
+# (method, path pattern, statements to run concurrently, view given their rows, whether to serve it here);
+# unmatched requests go to the WSGI app
+ROUTES = [
+    ('GET', re.compile(r'/venues/(?P<venue_id>\d+)'), venue_statements, show_venue, lambda: True),
+    ('GET', re.compile(r'/artists/(?P<artist_id>\d+)'), artist_statements, show_artist, lambda: True),
+    # The in-process ngram search keeps its index in the WSGI app, so only pg_trgm searches run here
+    ('POST', re.compile(r'/venues/search'), search_statements(Venue), search_view('pages/search_venues.html'),
+     trigram_search_enabled),
+    ('POST', re.compile(r'/artists/search'), search_statements(Artist), search_view('pages/search_artists.html'),
+     trigram_search_enabled),
+]
+
+
+def has_visitor_cookie(scope):
+    # A session may hold a flashed message, and loading it reads the session store synchronously; a
+    # visitor who just wrote must read from the primary.  The WSGI app handles both.
+    cookies = parse_cookie(b'; '.join(value for name, value in scope['headers'] if name == b'cookie'))
+    return app.session_cookie_name in cookies or STICKY_COOKIE in cookies
+
+
+def match(scope):
+    if scope['type'] != 'http' or has_visitor_cookie(scope):
+        return None, None, None
+    for method, pattern, statements, view, enabled in ROUTES:
+        found = pattern.fullmatch(scope['path'])
+        if found and scope['method'] == method and enabled():
+            return statements, view, {name: int(value) for name, value in found.groupdict().items()}
+    return None, None, None
+
+
+def prepare(scope, body, statements, kwargs):
+    """Return the statements to run, or None when the page cache already holds the page."""
+    with request_context(scope, body):
+        # A stored page is served from the cache by the WSGI app without querying at all
+        if scope['method'] == 'GET' and cache.backend.get(page_key()) is not None:
+            return None
+        # The ORM queries are only built here, but db.session needs an app to build them with
+        return statements(**kwargs)
+
+
+def dispatch(scope, body, view, kwargs, rows, started, query_seconds):
+    """Build the response from the fetched rows the way ``Flask.full_dispatch_request`` would.
+
+    Returns the status, headers and body to send.
+    """
+    with request_context(scope, body):
+        try:
+            try:
+                response = app.preprocess_request()
+                if response is None:
+                    # The hooks have just reset the counters of the statements that already ran
+                    g.request_started = started
+                    g.query_count = len(rows)
+                    g.query_seconds = query_seconds
+                    response = view(rows, **kwargs)
+            except Exception as error:
+                response = app.handle_user_exception(error)
+            response = app.finalize_request(response)
+        except Exception as error:
+            response = app.handle_exception(error)
+        headers = [(name.encode('latin-1'), value.encode('latin-1')) for name, value in response.headers]
+        return response.status_code, headers, response.get_data()
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await engine.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+
+    statements, view, kwargs = match(scope)
+    if view is None:
+        return await wsgi_application(scope, receive, send)
+
+    started = time.perf_counter()
+    body = await read_body(receive)
+    # The cache lookup (a Redis round trip), rendering and saving the session block, so they run on
+    # worker threads rather than holding up every other request on the loop
+    batch = await sync_to_async(prepare, thread_sensitive=False)(scope, body, statements, kwargs)
+    if batch is None:
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+        async def replay():
+            return messages.pop() if messages else await receive()
+        return await wsgi_application(scope, replay, send)
+
+    queries_started = time.perf_counter()
+    rows = await asyncio.gather(*[fetch_all(statement) for statement in batch])
+    status, headers, content = await sync_to_async(dispatch, thread_sensitive=False)(
+        scope, body, view, kwargs, rows, started, time.perf_counter() - queries_started)
+
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': content})
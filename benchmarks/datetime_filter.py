@@ -0,0 +1,81 @@
+"""Render time of the shows listing with the old and the new datetime filter.
+
+    $ python benchmarks/datetime_filter.py --shows 10000
+
+"before" feeds the template stringified start times through the previous filter, which re-parsed
+each string with dateutil and let babel parse the pattern on every call.  "after" feeds datetimes
+through the current filter.
+"""
+import argparse
+import os
+import secrets
+import sys
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+from flask import render_template
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, format_datetime  # noqa: E402
+from pagination import KeysetPage  # noqa: E402
+
+
+def legacy_format_datetime(value, format='medium'):
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def make_shows(count, stringify):
+    start = datetime(2026, 1, 1, 20, 0)
+    shows = []
+    for i in range(count):
+        start_time = start + timedelta(hours=7 * i)
+        shows.append({
+            "venue_id": i,
+            "venue_name": f"Venue {i}",
+            "artist_id": i,
+            "artist_name": f"Artist {i}",
+            "artist_image_link": "",
+            "start_time": f"{start_time}" if stringify else start_time,
+        })
+    return shows
+
+
+def render(app, shows, datetime_filter, repeat):
+    app.jinja_env.filters['datetime'] = datetime_filter
+    page = KeysetPage(shows, None, None, len(shows))
+    timings = []
+    with app.test_request_context('/shows'):
+        for _ in range(repeat):
+            started = time.perf_counter()
+            render_template('pages/shows.html', shows=shows, page=page)
+            timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--shows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    # Renders templates only; no session outlives the process
+    os.environ.setdefault('SECRET_KEY', secrets.token_hex(32))
+    app = create_app()
+    before = render(app, make_shows(args.shows, stringify=True), legacy_format_datetime, args.repeat)
+    after = render(app, make_shows(args.shows, stringify=False), format_datetime, args.repeat)
+
+    print(f'{args.shows} shows, best of {args.repeat}')
+    print(f'before: {before * 1000:8.1f} ms')
+    print(f'after:  {after * 1000:8.1f} ms  ({before / after:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,372 @@
+"""Sustained throughput and tail latency of a running server under a realistic mix of traffic.
+
+    $ python benchmarks/load.py --database-url sqlite:////tmp/fyyur-benchmark.db
+    $ python benchmarks/load.py --url http://staging.internal:8000 --concurrency 8,32,64
+    $ python benchmarks/load.py --baseline benchmarks/results/load-baseline.json --max-drop 0.10
+
+Without --url a server is started on a free local port with --server-command and stopped at the
+end; point --database-url at a seeded scratch database (see benchmarks/routes.py).  Each
+concurrency level runs for --duration seconds after a short warmup, with that many clients each
+sending its next request as soon as the previous one answers.  With --baseline the run exits
+non-zero when requests per second at any level fall by more than --max-drop; any run whose
+requests fail (5xx or no response) exits non-zero too.  `fab load_test` checks both.
+
+The write scenarios book shows at and edit a fixed set of scratch venues and artists, created
+on the first run and reused afterwards, so the seeded catalog the reads hit stays the same.
+
+The clients are threads of this process; when the server runs on the same machine they compete
+with it for CPU, so compare runs made on the same machine with the same settings.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SERVER_COMMAND = f'{shlex.quote(sys.executable)} -m flask run --port {{port}}'
+
+SEARCH_TERMS = ['a', 'Venue 1', 'Artist 12', 'jazz', 'New', 'zzz']
+
+FORM = 'application/x-www-form-urlencoded'
+
+# Names of the venues and artists the write scenarios work on
+SCRATCH_PREFIX = 'Load test scratch'
+SCRATCH_ROWS = 20
+
+
+def browse_venues(rnd, ids):
+    return 'GET', '/venues', None
+
+
+def browse_shows(rnd, ids):
+    return 'GET', '/shows', None
+
+
+def browse_artists(rnd, ids):
+    return 'GET', '/artists', None
+
+
+def venue_page(rnd, ids):
+    return 'GET', f'/venues/{rnd.choice(ids["venues"])}', None
+
+
+def artist_page(rnd, ids):
+    return 'GET', f'/artists/{rnd.choice(ids["artists"])}', None
+
+
+def search_venues(rnd, ids):
+    return 'POST', '/venues/search', {'search_term': rnd.choice(SEARCH_TERMS)}
+
+
+def search_artists(rnd, ids):
+    return 'POST', '/artists/search', {'search_term': rnd.choice(SEARCH_TERMS)}
+
+
+def create_venue(rnd, ids):
+    return 'POST', '/venues/create', {
+        'name': f'Load test venue {rnd.randrange(10 ** 9)}', 'city': 'Austin', 'state': 'TX',
+        'address': '1 Main Street', 'phone': '555-555-5555', 'genres': 'Jazz',
+    }
+
+
+def edit_artist(rnd, ids):
+    artist_id, name = rnd.choice(ids['scratch_artists'])
+    return 'POST', f'/artists/{artist_id}/edit', {
+        'name': name, 'city': 'Austin', 'state': 'TX',
+        'phone': f'555-555-{rnd.randrange(10000):04d}', 'genres': 'Jazz',
+    }
+
+
+def create_show(rnd, ids):
+    start = datetime.utcnow() + timedelta(days=rnd.randint(1, 90))
+    return 'POST', '/shows/create', {
+        'venue_id': rnd.choice(ids['scratch_venues'])[0], 'artist_id': rnd.choice(ids['scratch_artists'])[0],
+        'start_time': start.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+# (scenario, weight): mostly browsing, some searching, the odd write
+TRAFFIC_MIX = [
+    (browse_venues, 18),
+    (browse_shows, 15),
+    (browse_artists, 10),
+    (venue_page, 18),
+    (artist_page, 18),
+    (search_venues, 8),
+    (search_artists, 7),
+    (create_venue, 2),
+    (edit_artist, 2),
+    (create_show, 2),
+]
+
+WRITE_SCENARIOS = (create_venue, edit_artist, create_show)
+
+
+def percentile(sorted_values, share):
+    # Nearest rank
+    index = max(0, min(len(sorted_values) - 1, int(round(share * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(command, port, database_url):
+    env = dict(os.environ, FLASK_APP='app:create_app()')
+    if database_url:
+        env['DATABASE_URL'] = database_url
+    server = subprocess.Popen(shlex.split(command.format(port=port)), cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f'server exited with {server.returncode}: {command}')
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+            connection.request('GET', '/')
+            if connection.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit(f'server did not answer on port {port} within 60 s')
+
+
+def discover_ids(base_url):
+    """Venue and artist ids to request, streamed from the JSON API, plus the scratch rows among them."""
+    url = urlsplit(base_url)
+    ids = {}
+    for kind in ('venues', 'artists'):
+        connection = http.client.HTTPConnection(url.hostname, url.port, timeout=120)
+        connection.request('GET', f'/api/v1/{kind}?fields=id,name&format=ndjson')
+        response = connection.getresponse()
+        if response.status != 200:
+            raise SystemExit(f'/api/v1/{kind} returned {response.status}')
+        rows = [json.loads(line) for line in response.read().decode().splitlines() if line]
+        scratch = [row for row in rows if (row['name'] or '').startswith(SCRATCH_PREFIX)]
+        ids[kind] = [row['id'] for row in rows if not (row['name'] or '').startswith(SCRATCH_PREFIX)]
+        ids['scratch_' + kind] = [(row['id'], row['name']) for row in scratch]
+        if not ids[kind]:
+            raise SystemExit(f'no {kind} to request; seed the database first')
+    return ids
+
+
+def create_scratch_rows(base_url, ids):
+    """Create whatever scratch venues and artists earlier runs have not."""
+    url = urlsplit(base_url)
+    connection = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+    forms = {
+        'venues': {'city': 'Austin', 'state': 'TX', 'address': '1 Main Street', 'phone': '555-555-5555',
+                   'genres': 'Jazz'},
+        'artists': {'city': 'Austin', 'state': 'TX', 'phone': '555-555-5555', 'genres': 'Jazz'},
+    }
+    for kind, form in forms.items():
+        existing = {name for _, name in ids['scratch_' + kind]}
+        for i in range(SCRATCH_ROWS):
+            name = f'{SCRATCH_PREFIX} {kind[:-1]} {i}'
+            if name in existing:
+                continue
+            connection.request('POST', f'/{kind}/create', body=urlencode(dict(form, name=name)),
+                               headers={'Content-Type': FORM})
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                raise SystemExit(f'creating scratch {kind} returned {response.status}')
+
+
+class Client(threading.Thread):
+    """Sends requests back to back over one keep-alive connection until told to stop."""
+
+    def __init__(self, base_url, scenarios, weights, ids, seed, stop):
+        super().__init__(daemon=True)
+        url = urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port
+        self.scenarios, self.weights, self.ids = scenarios, weights, ids
+        self.rnd = random.Random(seed)
+        self.stop = stop
+        self.recording = False
+        self.results = []
+
+    def run(self):
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        while not self.stop.is_set():
+            scenario = self.rnd.choices(self.scenarios, cum_weights=self.weights)[0]
+            method, path, form = scenario(self.rnd, self.ids)
+            body = urlencode(form) if form is not None else None
+            headers = {'Content-Type': FORM} if form is not None else {}
+
+            started = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+                if response.getheader('Connection', '').lower() == 'close':
+                    connection.close()
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                status = None
+            elapsed = time.perf_counter() - started
+            if self.recording:
+                self.results.append((scenario.__name__, status, elapsed))
+        connection.close()
+
+
+def run_level(base_url, concurrency, duration, warmup, scenarios, weights, ids, seed):
+    stop = threading.Event()
+    clients = [Client(base_url, scenarios, weights, ids, seed * 1000 + i, stop) for i in range(concurrency)]
+    for client in clients:
+        client.start()
+    time.sleep(warmup)
+    for client in clients:
+        client.recording = True
+    started = time.perf_counter()
+    time.sleep(duration)
+    for client in clients:
+        client.recording = False
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for client in clients:
+        client.join()
+
+    results = [result for client in clients for result in client.results]
+    latencies = sorted(elapsed for _, _, elapsed in results)
+    errors = sum(1 for _, status, _ in results if status is None or status >= 500)
+    per_scenario = {}
+    for name, _, _ in results:
+        per_scenario[name] = per_scenario.get(name, 0) + 1
+    if not latencies:
+        raise SystemExit(f'no request completed at concurrency {concurrency}')
+    return {
+        "concurrency": concurrency,
+        "requests": len(results),
+        "errors": errors,
+        "requests_per_second": round(len(results) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "scenarios": dict(sorted(per_scenario.items())),
+    }
+
+
+def failed_requests(levels):
+    """Levels where any request failed; a server answering errors quickly is not faster."""
+    failed = []
+    for level in levels:
+        if level['errors']:
+            print(f'concurrency {level["concurrency"]:>3}: {level["errors"]} of {level["requests"]} requests failed')
+            failed.append(level['concurrency'])
+    return failed
+
+
+def regressions(baseline_path, levels, max_drop):
+    """Levels whose requests per second fell by more than ``max_drop`` from the baseline run."""
+    with open(baseline_path) as file:
+        baseline = {level['concurrency']: level for level in json.load(file)['levels']}
+    failed = []
+    for level in levels:
+        before = baseline.get(level['concurrency'])
+        if before is None:
+            print(f'concurrency {level["concurrency"]}: not in the baseline')
+            continue
+        change = level['requests_per_second'] / before['requests_per_second'] - 1
+        print(f'concurrency {level["concurrency"]:>3}: {before["requests_per_second"]:8.1f} -> '
+              f'{level["requests_per_second"]:8.1f} req/s ({change:+.1%}), '
+              f'p99 {before["p99_ms"]:.1f} -> {level["p99_ms"]:.1f} ms')
+        if change < -max_drop:
+            failed.append(level['concurrency'])
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='Server to load; started locally when omitted.')
+    parser.add_argument('--server-command', default=DEFAULT_SERVER_COMMAND,
+                        help='Command starting the server, run from the repository with {port} filled in.')
+    parser.add_argument('--database-url', help='DATABASE_URL of the started server.')
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma separated numbers of concurrent clients.')
+    parser.add_argument('--duration', type=float, default=20, help='Measured seconds per concurrency level.')
+    parser.add_argument('--warmup', type=float, default=3, help='Unmeasured seconds before each level.')
+    parser.add_argument('--read-only', action='store_true', help='Leave the create and edit POSTs out of the mix.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Result file; defaults to benchmarks/results/load-<time>.json.')
+    parser.add_argument('--baseline', help='Earlier result file to compare requests per second against.')
+    parser.add_argument('--max-drop', type=float, default=0.10,
+                        help='Largest accepted fall in requests per second, as a fraction of the baseline.')
+    args = parser.parse_args()
+
+    mix = [(scenario, weight) for scenario, weight in TRAFFIC_MIX
+           if not (args.read_only and scenario in WRITE_SCENARIOS)]
+    scenarios = [scenario for scenario, _ in mix]
+    weights = []
+    for _, weight in mix:
+        weights.append(weight + (weights[-1] if weights else 0))
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        port = free_port()
+        server = start_server(args.server_command, port, args.database_url)
+        base_url = f'http://127.0.0.1:{port}'
+
+    try:
+        ids = discover_ids(base_url)
+        if not args.read_only:
+            create_scratch_rows(base_url, ids)
+            ids = discover_ids(base_url)
+        levels = []
+        for concurrency in (int(value) for value in args.concurrency.split(',')):
+            level = run_level(base_url, concurrency, args.duration, args.warmup, scenarios, weights, ids, args.seed)
+            levels.append(level)
+            print(f'concurrency {concurrency:>3}: {level["requests_per_second"]:8.1f} req/s  '
+                  f'p50 {level["p50_ms"]:7.1f} ms  p95 {level["p95_ms"]:7.1f} ms  p99 {level["p99_ms"]:7.1f} ms  '
+                  f'{level["errors"]} errors', flush=True)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = {
+        "created_at": datetime.utcnow().isoformat(timespec='seconds'),
+        "url": args.url,
+        "server_command": None if args.url else args.server_command,
+        "duration": args.duration,
+        "read_only": args.read_only,
+        "levels": levels,
+    }
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results',
+                                         f'load-{datetime.utcnow():%Y%m%dT%H%M%S}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f'results written to {output}')
+
+    failed = False
+    if args.baseline:
+        slower = regressions(args.baseline, levels, args.max_drop)
+        if slower:
+            print(f'throughput fell by more than {args.max_drop:.0%} at concurrency '
+                  f'{", ".join(str(level) for level in slower)}')
+            failed = True
+    if failed_requests(levels):
+        failed = True
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+import csv
+import json
+
+from werkzeug.datastructures import MultiDict
+
+from app_config import db
+from counters import count_shows
+from models import Venue, Artist, Show
+from queries import LIVE_VENUE
+from search import SEARCHABLE_MODELS, invalidate_search
+
+# Kind of record -> (model, name of the form in forms.py whose rules each row must pass)
+IMPORTS = {
+    'venues': (Venue, 'VenueForm'),
+    'artists': (Artist, 'ArtistForm'),
+    'shows': (Show, 'ShowForm'),
+}
+
+DEFAULT_CHUNK_SIZE = 1000
+# Rows per INSERT batch accepted from callers; larger batches hold a transaction and the rows' memory
+# for longer without inserting any faster
+MAX_CHUNK_SIZE = 10000
+
+# Row errors kept in the report; the rest are only counted so memory stays flat on huge files
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportReport(object):
+
+    def __init__(self):
+        self.inserted = 0
+        self.rejected = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.errors = []
+
+    def error(self, message):
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+    def as_dict(self):
+        return {
+            "inserted": self.inserted,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "errors": self.errors,
+        }
+
+
+class RowError(object):
+    """Stands in for a record that could not be decoded; :func:`import_rows` rejects it."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def _decoded_lines(stream, bad_lines):
+    # Decoded one line at a time so a stray byte only costs the record it is in; the line numbers
+    # of undecodable lines are added to ``bad_lines``
+    for number, line in enumerate(stream, start=1):
+        try:
+            yield line.decode('utf-8-sig' if number == 1 else 'utf-8')
+        except UnicodeDecodeError:
+            bad_lines.add(number)
+            yield line.decode('utf-8', errors='replace')
+
+
+def read_rows(stream, format):
+    """Yield one dict per record of a binary CSV or NDJSON stream, without reading it all in.
+
+    Records that are not valid UTF-8, CSV or JSON objects are yielded as :class:`RowError`.
+    """
+    bad_lines = set()
+    lines = _decoded_lines(stream, bad_lines)
+    if format == 'csv':
+        reader = csv.DictReader(lines)
+        read = 0
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as error:
+                # The reader cannot find the start of the next record after this
+                yield RowError(f'line {reader.reader.line_num}: {error}; the rest of the file was skipped')
+                return
+            # Physical lines making up this record, the header included for the first one
+            if any(read < number <= reader.line_num for number in bad_lines):
+                yield RowError('not valid UTF-8')
+            else:
+                # Multi-valued cells such as genres are comma separated within the quoted CSV field
+                if row.get('genres'):
+                    row['genres'] = [genre.strip() for genre in row['genres'].split(',') if genre.strip()]
+                yield row
+            read = reader.line_num
+    elif format == 'ndjson':
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            if number in bad_lines:
+                yield RowError('not valid UTF-8')
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as error:
+                yield RowError(f'not valid JSON: {error}')
+                continue
+            yield row if isinstance(row, dict) else RowError('not a JSON object')
+    else:
+        raise ValueError(f'Unknown import format {format!r}')
+
+
+def _formdata(row):
+    formdata = MultiDict()
+    for key, value in row.items():
+        if value is None or value is False:
+            continue
+        if value is True:
+            value = 'y'
+        for item in value if isinstance(value, list) else [value]:
+            formdata.add(key, str(item))
+    return formdata
+
+
+def validate_row(model, form_class, row):
+    """Return ``(values, errors)`` for one record checked against the model's web form."""
+    form = form_class(formdata=_formdata(row), meta={'csrf': False})
+    if model is Show:
+        # Referenced ids are checked against the database once per batch instead of being loaded
+        # into the select choices
+        form.artist_id.validate_choice = False
+        form.venue_id.validate_choice = False
+    form.validate()
+
+    # Only rules for fields that are stored on the model apply, e.g. ArtistForm's address is ignored
+    columns = model.__table__.columns
+    errors = {field: messages for field, messages in form.errors.items() if field in columns}
+    values = {field: form.data[field] for field in form.data if field in columns and field != 'id'}
+    return values, errors
+
+
+def _missing_references(values):
+    venue_ids = {row['venue_id'] for row in values}
+    artist_ids = {row['artist_id'] for row in values}
+    found_venues = {row.id for row in db.session.query(Venue.id).filter(Venue.id.in_(venue_ids), LIVE_VENUE)}
+    found_artists = {row.id for row in db.session.query(Artist.id).filter(Artist.id.in_(artist_ids))}
+    return venue_ids - found_venues, artist_ids - found_artists
+
+
+def _write_batch(model, batch, report):
+    values = [row_values for _, row_values in batch]
+    try:
+        if model is Show:
+            missing_venues, missing_artists = _missing_references(values)
+            if missing_venues or missing_artists:
+                kept = []
+                for line, row_values in batch:
+                    if row_values['venue_id'] in missing_venues or row_values['artist_id'] in missing_artists:
+                        report.rejected += 1
+                        report.error(f'row {line}: unknown venue_id or artist_id')
+                    else:
+                        kept.append(row_values)
+                values = kept
+
+        if values:
+            # One executemany per batch; psycopg2 sends it as multi-row INSERT ... VALUES
+            db.session.execute(model.__table__.insert(), values)
+            if model is Show:
+                count_shows([(row['venue_id'], row['artist_id'], row['start_time']) for row in values])
+        db.session.commit()
+        report.inserted += len(values)
+    except Exception as error:
+        db.session.rollback()
+        report.failed_batches += 1
+        report.rejected += len(values)
+        report.error(f'rows {batch[0][0]}-{batch[-1][0]}: {error.__class__.__name__}: {error}'.splitlines()[0])
+    report.batches += 1
+
+
+def import_rows(kind, rows, chunk_size=DEFAULT_CHUNK_SIZE, on_batch=None):
+    """Validate and insert ``rows`` in batches of ``chunk_size``.
+
+    Invalid rows and failing batches are recorded in the returned :class:`ImportReport` and the
+    import carries on.  ``on_batch`` is called with the report after each batch.
+    """
+    model, form_name = IMPORTS[kind]
+    # wtforms is only loaded once something is imported
+    import forms
+    form_class = getattr(forms, form_name)
+    report = ImportReport()
+    batch = []
+
+    for line, row in enumerate(rows, start=1):
+        if isinstance(row, RowError):
+            report.rejected += 1
+            report.error(f'row {line}: {row.message}')
+            continue
+        values, errors = validate_row(model, form_class, row)
+        if errors:
+            report.rejected += 1
+            report.error(f'row {line}: ' + '; '.join(f'{field}: {" ".join(messages)}'
+                                                      for field, messages in errors.items()))
+            continue
+
+        batch.append((line, values))
+        if len(batch) >= chunk_size:
+            _write_batch(model, batch, report)
+            batch = []
+            if on_batch is not None:
+                on_batch(report)
+
+    if batch:
+        _write_batch(model, batch, report)
+        if on_batch is not None:
+            on_batch(report)
+
+    # The rows go in through Core inserts, which fire no ORM events
+    if model in SEARCHABLE_MODELS:
+        invalidate_search(model)
+    return report
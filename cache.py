@@ -0,0 +1,239 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import g, request, session, make_response
+
+# Headers stored along with a cached page body
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class LRUBackend(object):
+    """In-process LRU cache with per-entry expiry and tag sets for invalidation."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.key_tags = {}
+        self.tag_keys = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._discard(key)
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, tags=()):
+        with self.lock:
+            self._discard(key)
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.key_tags[key] = set(tags)
+            for tag in tags:
+                self.tag_keys.setdefault(tag, set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._discard(next(iter(self.entries)))
+
+    def invalidate_tags(self, tags):
+        with self.lock:
+            keys = set()
+            for tag in tags:
+                keys |= self.tag_keys.get(tag, set())
+            for key in keys:
+                self._discard(key)
+            return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.key_tags.clear()
+            self.tag_keys.clear()
+
+    def _discard(self, key):
+        self.entries.pop(key, None)
+        for tag in self.key_tags.pop(key, ()):
+            keys = self.tag_keys.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.tag_keys[tag]
+
+
+class RedisBackend(object):
+    """Cache shared by every worker through Redis; each tag is a Redis set of the keys it covers."""
+
+    def __init__(self, url, prefix='fyyur:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('CACHE_BACKEND=redis requires the redis package')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl, tags=()):
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + key, pickle.dumps(value), ex=ttl)
+        for tag in tags:
+            tag_key = self.prefix + 'tag:' + tag
+            pipe.sadd(tag_key, self.prefix + key)
+            pipe.expire(tag_key, ttl)
+        pipe.execute()
+
+    def invalidate_tags(self, tags):
+        tag_keys = [self.prefix + 'tag:' + tag for tag in tags]
+        keys = self.client.sunion(tag_keys) if tag_keys else set()
+        pipe = self.client.pipeline()
+        if keys:
+            pipe.delete(*keys)
+        pipe.delete(*tag_keys)
+        pipe.execute()
+        return len(keys)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class NullBackend(object):
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl, tags=()):
+        pass
+
+    def invalidate_tags(self, tags):
+        return 0
+
+    def clear(self):
+        pass
+
+
+def page_key():
+    # Pages are stored per path and query string
+    return 'page:' + request.full_path
+
+
+class PageCache(object):
+    """Caches rendered GET responses under tags that write handlers invalidate.
+
+    Tags given to :meth:`cached` may reference view arguments, e.g. ``'venue:{venue_id}'``; views
+    add tags for the rows they rendered with :meth:`tag`.
+    """
+
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        self.default_ttl = 60
+        self.replica_lag = 0
+        # The counters are updated by every request thread
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_BACKEND', 'lru')
+        app.config.setdefault('CACHE_DEFAULT_TTL', 60)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+        backend = app.config['CACHE_BACKEND']
+        if backend == 'lru':
+            self.backend = LRUBackend(app.config['CACHE_MAX_ENTRIES'])
+        elif backend == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        elif backend == 'null':
+            self.backend = NullBackend()
+        else:
+            raise ValueError(f'Unknown CACHE_BACKEND {backend!r}')
+        self.default_ttl = app.config['CACHE_DEFAULT_TTL']
+        # How long after a write the replica may still serve the old rows; see replica.py
+        self.replica_lag = app.config['REPLICA_STICKY_SECONDS'] if app.config.get('DATABASE_REPLICA_URL') else 0
+        app.extensions['page_cache'] = self
+
+    def tag(self, *tags):
+        g.setdefault('cache_tags', set()).update(tags)
+
+    def _count(self, name, amount=1):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def invalidate(self, *tags):
+        self._count('invalidations', self.backend.invalidate_tags(tags))
+        if self.replica_lag:
+            self.backend.set('invalidated', True, self.replica_lag)
+
+    def _storable(self):
+        # A page read from the replica soon after a write may predate it, and stored it would be served
+        # to everyone, the writer included, for the whole TTL
+        return not (g.get('use_replica') and self.backend.get('invalidated'))
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+    def value(self, key, compute, *tags, ttl=None):
+        """Return the value cached under ``key``, calling ``compute`` and storing its result on a miss."""
+        value = self.backend.get('value:' + key)
+        if value is not None:
+            self._count('hits')
+            return value
+        self._count('misses')
+        value = compute()
+        if self._storable():
+            self.backend.set('value:' + key, value, ttl or self.default_ttl, set(tags))
+        return value
+
+    def cached(self, *tags, ttl=None):
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                # Responses that carry a pending flash message belong to one visitor only, and a visitor
+                # who just wrote must not get a page someone else refilled from a lagging replica
+                if request.method != 'GET' or '_flashes' in session or g.get('read_primary'):
+                    return view(*args, **kwargs)
+
+                key = page_key()
+                entry = self.backend.get(key)
+                if entry is not None:
+                    self._count('hits')
+                    body, status, headers = entry
+                    response = make_response(body, status, headers)
+                    response.headers['X-Cache'] = 'HIT'
+                    # A stored page keeps its validators, so a current client gets a 304 from cache
+                    return response.make_conditional(request)
+
+                self._count('misses')
+                g.pop('cache_tags', None)
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed and self._storable():
+                    entry_tags = {tag.format(**kwargs) for tag in tags} | g.get('cache_tags', set())
+                    headers = [(name, value) for name, value in response.headers if name in CACHED_HEADERS]
+                    self.backend.set(key, (response.get_data(), response.status_code, headers),
+                                     ttl or self.default_ttl, entry_tags)
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
@@ -0,0 +1,144 @@
+import os
+from datetime import timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app_config import cache
+from bulk_import import IMPORTS, DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE, read_rows, import_rows
+from counters import roll_shows, recount
+from explain_check import explain_routes
+from export import EXPORTS, export_deletions, export_table, read_watermarks, write_watermarks
+from purge import purge_venues
+from seed import seed_dataset
+from sessions import DatabaseStore
+
+# Collects the commands below, which init_commands() adds to an app's `flask` command; each one
+# runs inside an app context
+cli = AppGroup('fyyur')
+
+
+@cli.command('seed')
+@click.option('--venues', default=100, show_default=True)
+@click.option('--artists', default=200, show_default=True)
+@click.option('--shows', default=1000, show_default=True)
+@click.option('--random-seed', default=0, show_default=True)
+def seed_command(venues, artists, shows, random_seed):
+    """Insert a synthetic catalog into the configured database."""
+    seed_dataset(venues=venues, artists=artists, shows=shows, seed=random_seed)
+    click.echo(f'Seeded {venues} venues, {artists} artists and {shows} shows.')
+
+
+@cli.command('explain-routes')
+@click.option('--verbose', is_flag=True, help='Print every checked statement.')
+def explain_routes_command(verbose):
+    """Fail if a listing or detail route's query reads a table without an index."""
+    failed = False
+    for path, statements in explain_routes(current_app._get_current_object()).items():
+        for statement, scans in statements:
+            if scans:
+                failed = True
+                click.echo(f'FAIL {path}: full scan of {", ".join(scans)}')
+                click.echo(f'     {" ".join(statement.split())}')
+            elif verbose:
+                click.echo(f'ok   {path}: {" ".join(statement.split())}')
+        if statements and not any(scans for _, scans in statements):
+            click.echo(f'ok   {path}')
+
+    if failed:
+        raise SystemExit(1)
+
+
+@cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(IMPORTS)))
+@click.argument('source', type=click.File('rb'))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'ndjson']),
+              help='Defaults to the file extension.')
+@click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True,
+              type=click.IntRange(1, MAX_CHUNK_SIZE), help='Rows per INSERT batch.')
+def import_command(kind, source, file_format, chunk_size):
+    """Stream venues, artists or shows from a CSV or NDJSON file ("-" for stdin)."""
+    if file_format is None:
+        extension = os.path.splitext(source.name)[1].lower()
+        file_format = 'csv' if extension == '.csv' else 'ndjson'
+
+    def progress(report):
+        click.echo(f'batch {report.batches}: {report.inserted} inserted, {report.rejected} rejected', err=True)
+
+    try:
+        report = import_rows(kind, read_rows(source, file_format), chunk_size=chunk_size, on_batch=progress)
+    finally:
+        cache.clear()
+
+    for error in report.errors:
+        click.echo(error, err=True)
+    click.echo(f'{report.inserted} inserted, {report.rejected} rejected, '
+               f'{report.failed_batches} of {report.batches} batches failed')
+    if report.rejected:
+        raise SystemExit(1)
+
+
+@cli.command('export')
+@click.argument('kinds', nargs=-1, type=click.Choice(sorted(EXPORTS)))
+@click.option('--output', '-o', default='exports', show_default=True, type=click.Path(file_okay=False),
+              help='Directory for the snapshot files and their watermarks.')
+@click.option('--gzip', 'compress', is_flag=True, help='Compress the CSV and columnar files.')
+@click.option('--full', is_flag=True, help='Export every row instead of those changed since the last export.')
+@click.option('--batch-size', default=None, type=int, help='Rows fetched and written per batch.')
+def export_command(kinds, output, compress, full, batch_size):
+    """Stream venues, artists and shows into CSV and columnar snapshot files, with the ids deleted since."""
+    os.makedirs(output, exist_ok=True)
+    watermarks = read_watermarks(output)
+    options = {
+        "compress": compress,
+        "batch_size": batch_size or current_app.config['EXPORT_BATCH_SIZE'],
+        "stream_results": current_app.config['SQLALCHEMY_SERVER_SIDE_CURSORS'],
+        "overlap": timedelta(seconds=current_app.config['EXPORT_OVERLAP_SECONDS']),
+    }
+    for kind in kinds or sorted(EXPORTS):
+        paths, rows, watermarks[kind] = export_table(
+            kind, output, since=None if full else watermarks.get(kind), **options)
+        click.echo(f'{kind}: {rows} rows -> {", ".join(paths)}')
+
+        # Deletions stay incremental with --full, so consumers of earlier snapshots still get them
+        path, rows, watermarks[f'{kind}.deleted'] = export_deletions(
+            kind, output, since=watermarks.get(f'{kind}.deleted'), **options)
+        click.echo(f'{kind}: {rows} deleted -> {path}')
+    write_watermarks(output, watermarks)
+
+
+@cli.command('roll-shows')
+@click.option('--recount', 'full', is_flag=True, help='Recompute every counter from the Show table.')
+def roll_shows_command(full):
+    """Move shows that have started from the upcoming to the past counters; run every minute."""
+    if full:
+        recount()
+        click.echo('Recounted upcoming and past shows.')
+    else:
+        click.echo(f'{roll_shows()} shows moved to past.')
+    cache.invalidate('venues')
+
+
+@cli.command('purge-venues')
+@click.option('--batch-size', default=None, type=int, help='Shows deleted per transaction.')
+def purge_venues_command(batch_size):
+    """Delete venues marked as deleted, with their shows, in small batches."""
+    venues, shows = purge_venues(batch_size or current_app.config['PURGE_BATCH_SIZE'],
+                                 on_batch=lambda shows: click.echo(f'{shows} shows deleted', err=True))
+    click.echo(f'Purged {venues} venues and {shows} shows.')
+
+
+@cli.command('sweep-sessions')
+def sweep_sessions_command():
+    """Delete expired server-side sessions (SESSION_BACKEND=database)."""
+    store = current_app.extensions.get('session_store')
+    if not isinstance(store, DatabaseStore):
+        click.echo('SESSION_BACKEND is not database; nothing to sweep.')
+        return
+    click.echo(f'Deleted {store.sweep()} expired sessions.')
+
+
+def init_commands(app):
+    for command in cli.commands.values():
+        app.cli.add_command(command)
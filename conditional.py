@@ -0,0 +1,49 @@
+import hashlib
+from functools import wraps
+
+from flask import g, request, make_response
+from werkzeug.http import is_resource_modified, quote_etag
+
+
+class _NotModified(Exception):
+    pass
+
+
+def check_modified(version, last_modified=None):
+    """Record the validators for the page being built and stop early if the client has it already.
+
+    ``version`` is any repr-able value that changes whenever the rendered page would, typically the
+    ids and ``updated_at`` stamps of the rows involved.  Views call this after querying and before
+    rendering, so a matching ``If-None-Match`` or ``If-Modified-Since`` skips the template entirely.
+    """
+    etag = quote_etag(hashlib.sha1(repr(version).encode()).hexdigest(), weak=True)
+    g.etag = etag
+    g.last_modified = last_modified
+    if request.method in ('GET', 'HEAD') and \
+            not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        raise _NotModified()
+
+
+def conditional(view):
+    """Answer 304 Not Modified when the view's :func:`check_modified` matches the request."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        # Validators of an earlier request in the same app context must not leak into this one
+        g.pop('etag', None)
+        g.pop('last_modified', None)
+        try:
+            response = make_response(view(*args, **kwargs))
+        except _NotModified:
+            response = make_response('', 304)
+
+        if g.get('etag'):
+            response.headers['ETag'] = g.etag
+        if g.get('last_modified'):
+            response.last_modified = g.last_modified
+        return response
+    return wrapper
+
+
+def latest(*stamps):
+    stamps = [stamp for stamp in stamps if stamp is not None]
+    return max(stamps) if stamps else None
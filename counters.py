@@ -0,0 +1,125 @@
+from collections import Counter
+from datetime import datetime
+
+from app_config import db
+from models import Venue, Artist, Show, JobWatermark
+from queries import LIVE_SHOW
+
+# Column on Show that points at each model carrying show counters
+COUNTED = {
+    Venue: Show.venue_id,
+    Artist: Show.artist_id,
+}
+
+ROLL_SHOWS = 'roll-shows'
+
+
+def rolled_until():
+    """Time up to which shows have been moved from the upcoming to the past counters.
+
+    Shows starting after it are counted as upcoming.  The row is read with a shared lock so that a
+    concurrent :func:`roll_shows` cannot move the boundary before this transaction commits.
+    """
+    value = db.session.query(JobWatermark.value) \
+        .filter(JobWatermark.name == ROLL_SHOWS) \
+        .with_for_update(read=True) \
+        .scalar()
+    return value if value is not None else datetime.utcnow()
+
+
+def _apply(model, column, deltas):
+    # One executemany of atomic "count = count + delta" updates; nothing is read back first
+    table = model.__table__
+    params = [{"row_id": row_id, "delta": delta} for row_id, delta in deltas.items() if delta]
+    if params:
+        db.session.execute(
+            table.update().where(table.c.id == db.bindparam('row_id'))
+                 .values({column: table.c[column] + db.bindparam('delta')}),
+            params)
+
+
+def count_shows(shows):
+    """Add new ``(venue_id, artist_id, start_time)`` shows to the counters of their venues and
+    artists, in the current transaction.
+    """
+    boundary = rolled_until()
+    deltas = {(model, column): Counter() for model in COUNTED for column in ('upcoming_shows_count', 'past_shows_count')}
+    for venue_id, artist_id, start_time in shows:
+        column = 'upcoming_shows_count' if start_time > boundary else 'past_shows_count'
+        deltas[Venue, column][venue_id] += 1
+        deltas[Artist, column][artist_id] += 1
+
+    for (model, column), counts in deltas.items():
+        _apply(model, column, counts)
+
+
+def uncount_shows(*criteria):
+    """Remove the shows matching ``criteria`` from the counters of their venues and artists.
+
+    The shows are counted per venue and artist in SQL, so a long history is never loaded row by row.
+    """
+    boundary = rolled_until()
+    upcoming = db.func.sum(db.case((Show.start_time > boundary, 1), else_=0))
+    for model, foreign_key in COUNTED.items():
+        rows = db.session.query(foreign_key, upcoming, db.func.count(Show.id)) \
+            .filter(*criteria) \
+            .group_by(foreign_key) \
+            .all()
+        _apply(model, 'upcoming_shows_count', {row_id: -upcoming for row_id, upcoming, _ in rows})
+        _apply(model, 'past_shows_count', {row_id: upcoming - total for row_id, upcoming, total in rows})
+
+
+def roll_shows(now=None):
+    """Move the shows that started since the last run from the upcoming to the past counters.
+
+    Returns the number of shows moved.  Meant to run every minute or so; between runs a show that
+    has just started is still counted as upcoming.
+    """
+    now = now or datetime.utcnow()
+    watermark = db.session.query(JobWatermark) \
+        .filter(JobWatermark.name == ROLL_SHOWS) \
+        .with_for_update() \
+        .first()
+    if watermark is None:
+        recount(now)
+        return 0
+
+    moved = 0
+    for model, foreign_key in COUNTED.items():
+        started = db.session.query(foreign_key, db.func.count(Show.id)) \
+            .filter(Show.start_time > watermark.value, Show.start_time <= now, LIVE_SHOW) \
+            .group_by(foreign_key) \
+            .all()
+        _apply(model, 'upcoming_shows_count', {row_id: -count for row_id, count in started})
+        _apply(model, 'past_shows_count', {row_id: count for row_id, count in started})
+        # Each show moves once per model; count it once
+        if model is Venue:
+            moved = sum(count for _, count in started)
+
+    watermark.value = now
+    db.session.commit()
+    return moved
+
+
+def recount(now=None):
+    """Recompute every counter from the Show table and restart the roll from ``now``.
+
+    For rows written around the counters, e.g. by the seed command, and to repair drift.
+    """
+    now = now or datetime.utcnow()
+    for model, foreign_key in COUNTED.items():
+        def shows_count(*criteria):
+            return db.select(db.func.count(Show.id)) \
+                .where(foreign_key == model.id, LIVE_SHOW, *criteria) \
+                .scalar_subquery()
+
+        db.session.execute(model.__table__.update().values(
+            upcoming_shows_count=shows_count(Show.start_time > now),
+            past_shows_count=shows_count(Show.start_time <= now)))
+
+    watermark = db.session.get(JobWatermark, ROLL_SHOWS)
+    if watermark is None:
+        db.session.add(JobWatermark(name=ROLL_SHOWS, value=now))
+    else:
+        watermark.value = now
+    db.session.commit()
@@ -0,0 +1,109 @@
+import json
+
+from sqlalchemy import event
+
+from app_config import db
+from models import Venue, Artist
+
+
+def _routes():
+    """``(method, path, form)`` of every checked request."""
+    # Detail pages and searches are checked against real rows so their statements have realistic parameters
+    venue = db.session.query(Venue.id, Venue.name).order_by(Venue.id).first()
+    artist = db.session.query(Artist.id, Artist.name).order_by(Artist.id).first()
+    db.session.remove()
+
+    routes = [('GET', '/venues', None), ('GET', '/artists', None), ('GET', '/shows', None)]
+    if venue is not None:
+        routes.append(('GET', f'/venues/{venue.id}', None))
+        routes.append(('POST', '/venues/search', {'search_term': (venue.name or '')[:4]}))
+    if artist is not None:
+        routes.append(('GET', f'/artists/{artist.id}', None))
+        routes.append(('POST', '/artists/search', {'search_term': (artist.name or '')[:4]}))
+    return routes
+
+
+def capture_statements(app, method, path, data=None):
+    """Request ``path`` through the test client and return the SELECT statements it executed."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    client = app.test_client()
+    if method == 'POST':
+        # The in-process ngram search reads every name once to build its index, by design; the
+        # request is repeated so the statements checked are the ones run against a built index
+        client.post(path, data=data)
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        response = client.open(path, method=method, data=data)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+    if response.status_code != 200:
+        raise RuntimeError(f'{method} {path} returned {response.status_code}')
+    return statements
+
+
+def _postgres_scans(connection, statement, parameters):
+    # With sequential scans priced out the planner only picks one when no usable index exists
+    connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    plan = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    scans = []
+    nodes = [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan':
+            scans.append(node['Relation Name'])
+        nodes.extend(node.get('Plans', []))
+    return scans
+
+
+def _sqlite_scans(connection, statement, parameters):
+    # A plan line such as "SCAN Show" reads the whole table; "SEARCH ... USING INDEX" and
+    # "SCAN ... USING INDEX" walk an index instead
+    details = [row[-1] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+
+    # Without a WHERE clause or a sort, a LIMITed query walks the rowid b-tree in primary key order
+    # and stops at the limit, which is as cheap as an index range scan.  A filtered one may read the
+    # whole table before it finds enough matches, so it is only excused when nothing is filtered.
+    upper = statement.upper()
+    if ' LIMIT ' in upper and ' WHERE ' not in upper and \
+            not any(detail.startswith('USE TEMP B-TREE') for detail in details):
+        return []
+
+    scans = []
+    for detail in details:
+        if detail.startswith('SCAN ') and ' USING ' not in detail:
+            scans.append(detail[len('SCAN '):].split()[0])
+    return scans
+
+
+def explain_routes(app):
+    """Return ``{request: [(statement, [tables read by full scan])]}`` for every checked route.
+
+    Requests are keyed by their path, prefixed with the method when it is not GET.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        full_scans = _postgres_scans
+    elif dialect == 'sqlite':
+        full_scans = _sqlite_scans
+    else:
+        raise RuntimeError(f'EXPLAIN check does not support {dialect}')
+
+    results = {}
+    for method, path, data in _routes():
+        request = path if method == 'GET' else f'{method} {path}'
+        results[request] = []
+        for statement, parameters in capture_statements(app, method, path, data):
+            with db.engine.begin() as connection:
+                scans = full_scans(connection, statement, parameters)
+            results[request].append((statement, scans))
+    return results
@@ -0,0 +1,223 @@
+import csv
+import gzip
+import io
+import json
+import os
+from datetime import datetime, timedelta
+
+from app_config import db
+from models import Venue, Artist, Show, Tombstone
+
+EXPORTS = {
+    'venues': Venue,
+    'artists': Artist,
+    'shows': Show,
+}
+
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_OVERLAP = timedelta(seconds=300)
+
+# Per-table cutoffs up to which rows and deletions have been exported, kept next to the snapshots
+WATERMARK_FILE = 'watermarks.json'
+
+
+def _cell(value):
+    # Same conventions as the bulk import: ISO timestamps and comma separated genres
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list):
+        return ','.join(value)
+    return value
+
+
+def _open(path, compress):
+    return gzip.open(path, 'wb') if compress else open(path, 'wb')
+
+
+def _arrow_type(pyarrow, column_type):
+    # GenreList is ARRAY with a JSON variant for SQLite; the values are lists either way
+    column_type = getattr(column_type, 'impl', column_type)
+    if isinstance(column_type, db.ARRAY):
+        return pyarrow.list_(_arrow_type(pyarrow, column_type.item_type))
+    return {
+        int: pyarrow.int64(),
+        float: pyarrow.float64(),
+        bool: pyarrow.bool_(),
+        str: pyarrow.string(),
+        bytes: pyarrow.binary(),
+        datetime: pyarrow.timestamp('us'),
+    }[column_type.python_type]
+
+
+class CsvWriter(object):
+    extension = '.csv'
+
+    def __init__(self, path, columns, compress=False):
+        self.file = _open(path, compress)
+        self.text = io.TextIOWrapper(self.file, encoding='utf-8', newline='')
+        self.writer = csv.writer(self.text)
+        self.writer.writerow([column.name for column in columns])
+
+    def write_batch(self, rows):
+        self.writer.writerows([_cell(value) for value in row] for row in rows)
+
+    def close(self):
+        self.text.close()
+
+
+class ColumnarJsonWriter(object):
+    """One JSON object of column arrays per batch, one batch per line.
+
+    Used when pyarrow is not installed; like a Parquet row group, each line can be read on its own.
+    """
+    extension = '.columns.ndjson'
+
+    def __init__(self, path, columns, compress=False):
+        self.file = _open(path, compress)
+        self.columns = [column.name for column in columns]
+
+    def write_batch(self, rows):
+        group = {column: [_cell(row[i]) for row in rows] for i, column in enumerate(self.columns)}
+        self.file.write(json.dumps({"rows": len(rows), "columns": group}, separators=(',', ':')).encode() + b'\n')
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter(object):
+    """Parquet file with one row group per batch.
+
+    The schema comes from the column types rather than the first batch, where a column that is all
+    None would be typed ``null`` and every later batch with a value in it rejected.
+    """
+    extension = '.parquet'
+
+    def __init__(self, path, columns, compress=False):
+        import pyarrow
+        import pyarrow.parquet
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema([(column.name, _arrow_type(pyarrow, column.type)) for column in columns])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression='gzip' if compress else 'snappy')
+
+    def write_batch(self, rows):
+        table = self.pyarrow.table({name: [row[i] for row in rows] for i, name in enumerate(self.schema.names)},
+                                   schema=self.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+
+class DeletionsWriter(CsvWriter):
+    extension = '.deleted.csv'
+
+
+def columnar_writer():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return ColumnarJsonWriter
+    return ParquetWriter
+
+
+def read_watermarks(directory):
+    path = os.path.join(directory, WATERMARK_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return {kind: datetime.fromisoformat(stamp) for kind, stamp in json.load(file).items()}
+
+
+def write_watermarks(directory, watermarks):
+    path = os.path.join(directory, WATERMARK_FILE)
+    with open(path + '.tmp', 'w') as file:
+        json.dump({kind: stamp.isoformat() for kind, stamp in watermarks.items()}, file, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def _changed_rows(statement, id_column, stamp_column, since, overlap, batch_size, stream_results, on_batch):
+    """Pass the rows stamped after ``since`` and at least ``overlap`` ago to ``on_batch``, in batches.
+
+    Stamps are taken when a row is flushed, not when it commits, and come from several workers'
+    clocks, so rows stamped in the last moments may not be visible yet while later-stamped ones
+    are.  Leaving the most recent ``overlap`` for the next run means each run reads the interval
+    after the previous one's cutoff, with nothing read twice and nothing skipped unless a
+    transaction stays open longer than ``overlap``.  Returns ``(rows, cutoff)``, the cutoff being
+    the next run's ``since``.
+    """
+    cutoff = datetime.utcnow() - overlap
+    statement = statement.where(stamp_column <= cutoff)
+    if since is not None:
+        statement = statement.where(stamp_column > since)
+    statement = statement.order_by(stamp_column, id_column)
+
+    rows = 0
+    result = db.session.execute(statement, execution_options={'stream_results': stream_results})
+    try:
+        for batch in result.partitions(batch_size):
+            on_batch(batch)
+            rows += len(batch)
+    finally:
+        result.close()
+    # A clock set back between runs must not move the watermark back and export rows again
+    return rows, max(cutoff, since) if since is not None else cutoff
+
+
+def _writers(kind, directory, compress, columns, stamp, classes):
+    suffix = '.gz' if compress else ''
+    writers = []
+    for writer_class in classes:
+        path = os.path.join(directory, f'{kind}-{stamp}{writer_class.extension}')
+        if writer_class is not ParquetWriter:
+            path += suffix
+        writers.append((path, writer_class(path, columns, compress)))
+    return writers
+
+
+def export_table(kind, directory, since=None, compress=False, batch_size=DEFAULT_BATCH_SIZE,
+                 stream_results=True, overlap=DEFAULT_OVERLAP):
+    """Write the rows of ``kind`` changed after the ``since`` watermark to a CSV and a columnar file.
+
+    Rows are fetched ``batch_size`` at a time from a server-side cursor and written out batch by
+    batch, so memory use does not grow with the table.  Returns ``(paths, rows, watermark)``.
+    """
+    table = EXPORTS[kind].__table__
+    columns = list(table.columns)
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+    writers = _writers(kind, directory, compress, columns, stamp, (CsvWriter, columnar_writer()))
+
+    def write(batch):
+        for _, writer in writers:
+            writer.write_batch(batch)
+
+    try:
+        rows, watermark = _changed_rows(db.select(table), table.c.id, table.c.updated_at, since, overlap,
+                                        batch_size, stream_results, write)
+    finally:
+        for _, writer in writers:
+            writer.close()
+
+    return [path for path, _ in writers], rows, watermark
+
+
+def export_deletions(kind, directory, since=None, compress=False, batch_size=DEFAULT_BATCH_SIZE,
+                     stream_results=True, overlap=DEFAULT_OVERLAP):
+    """Write the ids of rows of ``kind`` deleted after the ``since`` watermark to ``<kind>-<time>.deleted.csv``.
+
+    Only rows removed outright are listed; soft-deleted venues are exported as changed rows with
+    ``deleted_at`` set.  Returns ``(path, rows, watermark)``.
+    """
+    tombstones = Tombstone.__table__
+    statement = db.select(tombstones.c.id, tombstones.c.row_id, tombstones.c.deleted_at) \
+        .where(tombstones.c.table_name == EXPORTS[kind].__tablename__)
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+    (path, writer), = _writers(kind, directory, compress, [tombstones.c.row_id.label('id'), tombstones.c.deleted_at], stamp, (DeletionsWriter,))
+
+    try:
+        rows, watermark = _changed_rows(statement, tombstones.c.id, tombstones.c.deleted_at, since, overlap,
+                                        batch_size, stream_results,
+                                        lambda batch: writer.write_batch([row[1:] for row in batch]))
+    finally:
+        writer.close()
+
+    return path, rows, watermark
@@ -1,3 +1,5 @@
+import os
+
 from fabric.api import local, settings, abort
 from fabric.contrib.console import confirm
 
@@ -13,6 +15,20 @@ def test():
         abort("Aborted at user request.")
 
 
+def load_test(update_baseline='no', max_drop='0.10'):
+    """Fail when requests per second fall more than max_drop below the saved baseline, or requests fail."""
+    baseline = 'benchmarks/results/load-baseline.json'
+    if update_baseline == 'yes' or not os.path.exists(baseline):
+        local("python benchmarks/load.py --output {}".format(baseline))
+        return
+    with settings(warn_only=True):
+        result = local(
+            "python benchmarks/load.py --baseline {} --max-drop {}".format(baseline, max_drop)
+        )
+    if result.failed and not confirm("Load test failed: throughput regressed or requests errored. Continue?"):
+        abort("Aborted at user request.")
+
+
 def commit():
     message = raw_input("Enter a git commit message: ")
     local("git add . && git commit -am '{}'".format(message))
@@ -24,6 +40,7 @@ def push():
 
 def prepare():
     test()
+    load_test()
     commit()
     push()
 
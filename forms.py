@@ -15,7 +15,8 @@ class ShowForm(Form):
     start_time = DateTimeField(
         'start_time',
         validators=[DataRequired()],
-        default=datetime.today()
+        # Called for each new form, not once at import
+        default=datetime.today
     )
 
 
@@ -0,0 +1,72 @@
+"""gunicorn settings for ``gunicorn wsgi:app``, which reads this file from the working directory.
+
+Everything can be overridden from the environment: ``PORT``, ``WEB_CONCURRENCY`` (workers),
+``GUNICORN_WORKER_CLASS`` (gthread or gevent), ``GUNICORN_THREADS``, ``GUNICORN_WORKER_CONNECTIONS``
+and ``GUNICORN_PRELOAD``.  Send HUP to the master to restart the workers gracefully; with preload
+on they come back with the code the master loaded, so deploy new code with USR2 (start a new
+master alongside) followed by QUIT to the old one.
+"""
+import gc
+import multiprocessing
+import os
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 8000)}")
+
+# gthread runs a few requests per worker on threads, enough for pages that mostly wait on Postgres;
+# gevent suits many slow clients
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 100))
+
+# The app is imported and warmed up once in the master and shared copy-on-write with the workers
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') not in ('0', 'false', 'False')
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+# Recycle workers now and then so slow leaks and fragmentation do not build up; the jitter keeps
+# them from restarting all at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+pidfile = os.environ.get('GUNICORN_PIDFILE')
+accesslog = '-'
+
+# Each worker has its own connection pool, sized to the requests it runs at once, so the app opens
+# at most workers x (DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW) connections.  Set here because
+# the app reads them when it is loaded.
+os.environ.setdefault('DATABASE_POOL_SIZE', str(min(worker_connections, 10) if worker_class == 'gevent' else threads))
+os.environ.setdefault('DATABASE_MAX_OVERFLOW', '0')
+
+# The in-process page cache only sees the invalidations of the worker that handled the write, so
+# several workers share Redis unless CACHE_BACKEND says otherwise
+if workers > 1:
+    os.environ.setdefault('CACHE_BACKEND', 'redis')
+
+if worker_class == 'gevent':
+    # Patch before the app and the database driver are imported into the master
+    from gevent import monkey
+    monkey.patch_all()
+    try:
+        from psycogreen.gevent import patch_psycopg
+    except ImportError:
+        pass
+    else:
+        patch_psycopg()
+
+
+def when_ready(server):
+    if preload_app:
+        # Objects loaded so far are left alone by the collector, which would otherwise write to
+        # (and so copy) every page of them in each worker
+        gc.freeze()
+    server.log.info(f'{workers} {worker_class} workers, up to {workers} x ({os.environ["DATABASE_POOL_SIZE"]} + '
+                    f'{os.environ["DATABASE_MAX_OVERFLOW"]}) database connections')
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from wsgi import app
+        from app_config import db
+        from pool import dispose_inherited_connections
+        dispose_inherited_connections(db, app)
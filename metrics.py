@@ -0,0 +1,134 @@
+import json
+import threading
+import time
+
+from flask import Response, g, has_app_context, request
+from jinja2 import Template
+
+from query_stats import query_count, query_seconds
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Routes are labelled by their URL rule, e.g. /venues/<int:venue_id>, so the number of series stays bounded
+LABELS = ('route', 'method', 'status')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram(object):
+    """Prometheus histogram kept in process memory, one series per label combination."""
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self.lock:
+            counts, total, observed = self.series.get(labels, ([0] * len(self.buckets), 0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.series[labels] = (counts, total + value, observed + 1)
+
+    def exposition(self):
+        with self.lock:
+            series = sorted((labels, list(counts), total, observed)
+                            for labels, (counts, total, observed) in self.series.items())
+
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        for labels, counts, total, observed in series:
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(LABELS, labels))
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {observed}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total}')
+            lines.append(f'{self.name}_count{{{label_text}}} {observed}')
+        return '\n'.join(lines)
+
+
+REQUEST_SECONDS = Histogram('fyyur_request_duration_seconds', 'Wall time spent handling the request.',
+                            SECONDS_BUCKETS)
+QUERY_COUNT = Histogram('fyyur_request_queries', 'SQL statements executed per request.', QUERY_BUCKETS)
+QUERY_SECONDS = Histogram('fyyur_request_query_seconds', 'Time spent in SQL statements per request.',
+                          SECONDS_BUCKETS)
+TEMPLATE_SECONDS = Histogram('fyyur_request_template_seconds', 'Time spent rendering templates per request.',
+                             SECONDS_BUCKETS)
+RESPONSE_BYTES = Histogram('fyyur_response_bytes', 'Size of the response body; streamed bodies are not counted.',
+                           BYTES_BUCKETS)
+
+HISTOGRAMS = (REQUEST_SECONDS, QUERY_COUNT, QUERY_SECONDS, TEMPLATE_SECONDS, RESPONSE_BYTES)
+
+
+class TimedTemplate(Template):
+    # Only top-level templates go through render(); the ones they extend or include are not counted twice
+
+    def render(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            if has_app_context():
+                g.template_seconds = g.get('template_seconds', 0.0) + time.perf_counter() - started
+
+
+def exposition():
+    return '\n'.join(histogram.exposition() for histogram in HISTOGRAMS) + '\n'
+
+
+def init_metrics(app):
+    """Record wall, SQL and template time, query count and response size of every request.
+
+    Each worker process keeps its own histograms; Prometheus sums them when it scrapes every worker.
+    Requests slower than ``SLOW_REQUEST_SECONDS`` are also logged as one JSON line.
+    """
+    app.config.setdefault('SLOW_REQUEST_SECONDS', 1.0)
+    app.jinja_env.template_class = TimedTemplate
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+        g.template_seconds = 0.0
+
+    @app.after_request
+    def record_request(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+
+        seconds = time.perf_counter() - started
+        route = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+        labels = (route, request.method, str(response.status_code))
+        size = None if response.is_streamed else response.calculate_content_length()
+
+        REQUEST_SECONDS.observe(labels, seconds)
+        QUERY_COUNT.observe(labels, query_count())
+        QUERY_SECONDS.observe(labels, query_seconds())
+        TEMPLATE_SECONDS.observe(labels, g.get('template_seconds', 0.0))
+        if size is not None:
+            RESPONSE_BYTES.observe(labels, size)
+
+        if seconds >= app.config['SLOW_REQUEST_SECONDS']:
+            app.logger.warning(json.dumps({
+                "event": "slow_request",
+                "method": request.method,
+                "path": request.full_path.rstrip('?'),
+                "route": route,
+                "status": response.status_code,
+                "seconds": round(seconds, 6),
+                "queries": query_count(),
+                "query_seconds": round(query_seconds(), 6),
+                "template_seconds": round(g.get('template_seconds', 0.0), 6),
+                "bytes": size,
+            }))
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,40 @@
+"""cascade venue deletes
+
+Revision ID: 0c5e9a7d4f18
+Revises: 7b1f0d2c8e63
+Create Date: 2026-10-18 17:32:50.208316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0c5e9a7d4f18'
+down_revision = '7b1f0d2c8e63'
+branch_labels = None
+depends_on = None
+
+# The constraint was created unnamed; Postgres named it after this pattern, and SQLite's batch mode
+# needs the same name supplied to find it in the reflected table
+FK_NAME = 'Show_venue_id_fkey'
+NAMING_CONVENTION = {'fk': '%(table_name)s_%(column_0_name)s_fkey'}
+
+
+def _replace_venue_fk(ondelete):
+    with op.batch_alter_table('Show', naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint(FK_NAME, type_='foreignkey')
+        batch_op.create_foreign_key(FK_NAME, 'Venue', ['venue_id'], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    _replace_venue_fk('CASCADE')
+    op.add_column('Venue', sa.Column('deleted_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_Venue_deleted_at', 'Venue', ['deleted_at'], unique=False,
+                    postgresql_where=sa.text('deleted_at IS NOT NULL'), sqlite_where=sa.text('deleted_at IS NOT NULL'))
+
+
+def downgrade():
+    op.drop_index('ix_Venue_deleted_at', table_name='Venue')
+    op.drop_column('Venue', 'deleted_at')
+    _replace_venue_fk(None)
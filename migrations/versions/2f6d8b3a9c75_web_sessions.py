@@ -0,0 +1,30 @@
+"""web sessions
+
+Revision ID: 2f6d8b3a9c75
+Revises: 0c5e9a7d4f18
+Create Date: 2026-10-18 19:05:12.417203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f6d8b3a9c75'
+down_revision = '0c5e9a7d4f18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('WebSession',
+                    sa.Column('id', sa.String(length=64), nullable=False),
+                    sa.Column('data', sa.LargeBinary(), nullable=False),
+                    sa.Column('expires_at', sa.DateTime(), nullable=False),
+                    sa.PrimaryKeyConstraint('id'))
+    op.create_index(op.f('ix_WebSession_expires_at'), 'WebSession', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_WebSession_expires_at'), table_name='WebSession')
+    op.drop_table('WebSession')
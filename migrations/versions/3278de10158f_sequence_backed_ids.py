@@ -0,0 +1,37 @@
+"""sequence backed ids
+
+Revision ID: 3278de10158f
+Revises: ff7f3e566e09
+Create Date: 2026-10-18 09:12:41.530114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3278de10158f'
+down_revision = 'ff7f3e566e09'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist', 'Show')
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    # Ids used to be assigned by the application as max(id) + 1, so the serial sequences were never
+    # advanced.  Make sure each table draws its id from its sequence and move the sequence past the
+    # ids that are already in use.
+    for table in TABLES:
+        sequence = f'{table}_id_seq'
+        op.execute(f'CREATE SEQUENCE IF NOT EXISTS "{sequence}" OWNED BY "{table}".id')
+        op.execute(f'ALTER TABLE "{table}" ALTER COLUMN id SET DEFAULT nextval(\'"{sequence}"\')')
+        op.execute(f'SELECT setval(\'"{sequence}"\', COALESCE(MAX(id), 0) + 1, false) FROM "{table}"')
+
+
+def downgrade():
+    # The sequences are the serial defaults the tables were created with, so they are left in place
+    pass
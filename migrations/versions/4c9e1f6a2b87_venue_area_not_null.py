@@ -0,0 +1,37 @@
+"""venue area not null
+
+Revision ID: 4c9e1f6a2b87
+Revises: 2f6d8b3a9c75
+Create Date: 2026-10-18 21:14:37.602118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c9e1f6a2b87'
+down_revision = '2f6d8b3a9c75'
+branch_labels = None
+depends_on = None
+
+
+def _alter_area(**options):
+    with op.batch_alter_table('Venue') as batch_op:
+        batch_op.alter_column('state', existing_type=sa.String(length=120), **options)
+        batch_op.alter_column('city', existing_type=sa.String(length=120), **options)
+    if op.get_bind().dialect.name == 'sqlite':
+        # SQLite's batch mode rebuilds the table and cannot carry the lower(name) expression index over
+        op.execute('CREATE INDEX IF NOT EXISTS "ix_Venue_name_prefix" ON "Venue" (lower(name))')
+
+
+def upgrade():
+    # A NULL in the (state, city, id) listing key never compares greater than anything, so the page
+    # after such a venue came back empty
+    op.execute('UPDATE "Venue" SET state = \'\' WHERE state IS NULL')
+    op.execute('UPDATE "Venue" SET city = \'\' WHERE city IS NULL')
+    _alter_area(nullable=False, server_default='')
+
+
+def downgrade():
+    _alter_area(nullable=True, server_default=None)
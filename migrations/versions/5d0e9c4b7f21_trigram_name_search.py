@@ -0,0 +1,33 @@
+"""trigram name search
+
+Revision ID: 5d0e9c4b7f21
+Revises: a41c7e2d9b06
+Create Date: 2026-10-18 11:24:53.907318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d0e9c4b7f21'
+down_revision = 'a41c7e2d9b06'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.create_index('ix_Venue_name_trgm', 'Venue', ['name'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+        op.create_index('ix_Artist_name_trgm', 'Artist', ['name'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    else:
+        op.create_index('ix_Venue_name_trgm', 'Venue', ['name'], unique=False)
+        op.create_index('ix_Artist_name_trgm', 'Artist', ['name'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Artist_name_trgm', table_name='Artist')
+    op.drop_index('ix_Venue_name_trgm', table_name='Venue')
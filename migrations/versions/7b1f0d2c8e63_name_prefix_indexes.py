@@ -0,0 +1,31 @@
+"""name prefix indexes
+
+Revision ID: 7b1f0d2c8e63
+Revises: e4a7c3d19b52
+Create Date: 2026-10-18 16:05:12.447021
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b1f0d2c8e63'
+down_revision = 'e4a7c3d19b52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # text_pattern_ops lets Postgres use the index for LIKE 'prefix%' whatever the database collation
+    if op.get_bind().dialect.name == 'postgresql':
+        expression = sa.text('lower(name) text_pattern_ops')
+    else:
+        expression = sa.text('lower(name)')
+    op.create_index('ix_Venue_name_prefix', 'Venue', [expression], unique=False)
+    op.create_index('ix_Artist_name_prefix', 'Artist', [expression], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Artist_name_prefix', table_name='Artist')
+    op.drop_index('ix_Venue_name_prefix', table_name='Venue')
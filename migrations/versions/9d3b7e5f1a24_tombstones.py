@@ -0,0 +1,62 @@
+"""tombstones
+
+Revision ID: 9d3b7e5f1a24
+Revises: 4c9e1f6a2b87
+Create Date: 2026-10-18 22:41:09.318554
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3b7e5f1a24'
+down_revision = '4c9e1f6a2b87'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist', 'Show')
+
+RECORD_TOMBSTONE = """
+    CREATE OR REPLACE FUNCTION record_tombstone() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO "Tombstone" (table_name, row_id, deleted_at)
+        VALUES (TG_TABLE_NAME, OLD.id, timezone('utc', clock_timestamp()));
+        RETURN OLD;
+    END
+    $$ LANGUAGE plpgsql
+"""
+
+
+def upgrade():
+    op.create_table('Tombstone',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('table_name', sa.String(length=64), nullable=False),
+                    sa.Column('row_id', sa.Integer(), nullable=False),
+                    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+                    sa.PrimaryKeyConstraint('id'))
+    op.create_index('ix_Tombstone_table_name_deleted_at', 'Tombstone', ['table_name', 'deleted_at'], unique=False)
+
+    # Triggers rather than application code, so rows removed by ON DELETE CASCADE are recorded too
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(RECORD_TOMBSTONE)
+        for table in TABLES:
+            op.execute(f'CREATE TRIGGER "{table}_tombstone" AFTER DELETE ON "{table}" '
+                       f'FOR EACH ROW EXECUTE PROCEDURE record_tombstone()')
+    else:
+        for table in TABLES:
+            op.execute(f'CREATE TRIGGER "{table}_tombstone" AFTER DELETE ON "{table}" BEGIN '
+                       f'INSERT INTO "Tombstone" (table_name, row_id, deleted_at) '
+                       f"VALUES ('{table}', OLD.id, strftime('%Y-%m-%d %H:%M:%f', 'now') || '000'); END")
+
+
+def downgrade():
+    for table in TABLES:
+        if op.get_bind().dialect.name == 'postgresql':
+            op.execute(f'DROP TRIGGER "{table}_tombstone" ON "{table}"')
+        else:
+            op.execute(f'DROP TRIGGER "{table}_tombstone"')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP FUNCTION record_tombstone()')
+    op.drop_index('ix_Tombstone_table_name_deleted_at', table_name='Tombstone')
+    op.drop_table('Tombstone')
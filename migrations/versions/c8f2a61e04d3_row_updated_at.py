@@ -0,0 +1,42 @@
+"""row updated_at
+
+Revision ID: c8f2a61e04d3
+Revises: 5d0e9c4b7f21
+Create Date: 2026-10-18 12:41:06.118452
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8f2a61e04d3'
+down_revision = '5d0e9c4b7f21'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist', 'Show')
+
+
+def upgrade():
+    # Existing rows are stamped with the migration time; the application writes the column from then on
+    if op.get_bind().dialect.name == 'postgresql':
+        for table in TABLES:
+            op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                           server_default=sa.text("timezone('utc', now())")))
+            op.alter_column(table, 'updated_at', server_default=None)
+        return
+
+    # SQLite cannot add a NOT NULL column with a non-constant default, so the column is added
+    # nullable, filled in and then made NOT NULL by rebuilding the table
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute(f'UPDATE "{table}" SET updated_at = CURRENT_TIMESTAMP')
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_column('updated_at')
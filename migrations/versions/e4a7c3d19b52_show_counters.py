@@ -0,0 +1,51 @@
+"""show counters
+
+Revision ID: e4a7c3d19b52
+Revises: c8f2a61e04d3
+Create Date: 2026-10-18 15:20:44.930115
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a7c3d19b52'
+down_revision = 'c8f2a61e04d3'
+branch_labels = None
+depends_on = None
+
+# Counted table -> its foreign key column on Show
+COUNTED = {'Venue': 'venue_id', 'Artist': 'artist_id'}
+
+
+def upgrade():
+    op.create_table('JobWatermark',
+                    sa.Column('name', sa.String(length=64), nullable=False),
+                    sa.Column('value', sa.DateTime(), nullable=False),
+                    sa.PrimaryKeyConstraint('name'))
+
+    for table in COUNTED:
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), nullable=False, server_default='0'))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill from the shows as of now and start rolling from the same instant
+    now = datetime.utcnow()
+    for table, foreign_key in COUNTED.items():
+        op.execute(sa.text(
+            f'UPDATE "{table}" SET '
+            f'upcoming_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{foreign_key} = "{table}".id '
+            f'AND "Show".start_time > :now), '
+            f'past_shows_count = (SELECT count(*) FROM "Show" WHERE "Show".{foreign_key} = "{table}".id '
+            f'AND "Show".start_time <= :now)'
+        ).bindparams(now=now))
+    op.execute(sa.text('INSERT INTO "JobWatermark" (name, value) VALUES (\'roll-shows\', :now)').bindparams(now=now))
+
+
+def downgrade():
+    for table in COUNTED:
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
+    op.drop_table('JobWatermark')
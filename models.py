@@ -1,14 +1,22 @@
+from datetime import datetime
+
+from sqlalchemy import DDL, event
+
 from app_config import db
 
+# Postgres stores genres as a native array; SQLite (scratch and benchmark databases) stores them as JSON
+GenreList = db.ARRAY(db.String).with_variant(db.JSON, 'sqlite')
+
 
 class Venue(db.Model):
     __tablename__ = 'Venue'
 
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, db.Sequence('Venue_id_seq'), primary_key=True)
     name = db.Column(db.String)
-    genres = db.Column(db.ARRAY(db.String), nullable=True)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
+    genres = db.Column(GenreList, nullable=True)
+    # Part of the listing's keyset cursor, which cannot seek past NULLs
+    city = db.Column(db.String(120), nullable=False, default='', server_default='')
+    state = db.Column(db.String(120), nullable=False, default='', server_default='')
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
@@ -16,7 +24,28 @@ class Venue(db.Model):
     facebook_link = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(1000))
-    shows = db.relationship('Show', backref='venue_show', cascade="all,delete", lazy=True)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Maintained by counters.py as shows are added and removed and as they start
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Set when a venue with a long show history is deleted; `flask purge-venues` removes the rows later
+    deleted_at = db.Column(db.DateTime, nullable=True)
+    # The database deletes a venue's shows through the ON DELETE CASCADE foreign key, so they are
+    # never loaded to be deleted one by one
+    shows = db.relationship('Show', backref='venue_show', cascade="all,delete", passive_deletes=True, lazy=True)
+
+    __table_args__ = (
+        # Area listing: grouped and paged in (state, city, id) order
+        db.Index('ix_Venue_state_city_id', 'state', 'city', 'id'),
+        # Venue search: pg_trgm index serving name ILIKE '%term%'
+        db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        # Show form autocomplete: lower(name) LIKE 'prefix%'
+        db.Index('ix_Venue_name_prefix', db.func.lower(db.column('name')).label('lower_name'),
+                 postgresql_ops={'lower_name': 'text_pattern_ops'}),
+        # The few soft-deleted venues, looked up to hide their shows
+        db.Index('ix_Venue_deleted_at', 'deleted_at',
+                 postgresql_where=db.text('deleted_at IS NOT NULL'), sqlite_where=db.text('deleted_at IS NOT NULL')),
+    )
 
     def __repr__(self):
         return f'<Venue {self.id} {self.name}>'
@@ -25,24 +54,100 @@ class Venue(db.Model):
 class Artist(db.Model):
     __tablename__ = 'Artist'
 
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, db.Sequence('Artist_id_seq'), primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String), nullable=True)
+    genres = db.Column(GenreList, nullable=True)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website = db.Column(db.String, nullable=True)
     seeking_venue = db.Column(db.Boolean)
     seeking_description = db.Column(db.String(1000))
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     shows = db.relationship('Show', backref='artist_show', lazy=True)
 
+    __table_args__ = (
+        # Artist search: pg_trgm index serving name ILIKE '%term%'
+        db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        db.Index('ix_Artist_name_prefix', db.func.lower(db.column('name')).label('lower_name'),
+                 postgresql_ops={'lower_name': 'text_pattern_ops'}),
+    )
+
 
 class Show(db.Model):
     __tablename__ = 'Show'
 
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(db.Integer, db.Sequence('Show_id_seq'), primary_key=True)
     artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
-    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Venue detail pages and upcoming-show counts per venue
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        # Artist detail pages and upcoming-show counts per artist
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+        # Shows listing: paged in (start_time, id) order
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+    )
+
+
+class JobWatermark(db.Model):
+    # How far a periodic job has got, e.g. the time up to which shows were rolled from upcoming to past
+    __tablename__ = 'JobWatermark'
+
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.DateTime, nullable=False)
+
+
+class WebSession(db.Model):
+    # Server-side session data for SESSION_BACKEND=database; the cookie only carries the signed id
+    __tablename__ = 'WebSession'
+
+    id = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class Tombstone(db.Model):
+    # One row per hard-deleted Venue, Artist or Show, written by the triggers below (including rows
+    # removed by ON DELETE CASCADE), so `flask export` can pass deletions on
+    __tablename__ = 'Tombstone'
+
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(64), nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_Tombstone_table_name_deleted_at', 'table_name', 'deleted_at'),
+    )
+
+
+# Same DDL as migration 9d3b7e5f1a24, for databases built with create_all().  DDL strings are
+# %-formatted, hence the doubled percent signs.
+event.listen(db.metadata, 'before_create', DDL("""
+    CREATE OR REPLACE FUNCTION record_tombstone() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO "Tombstone" (table_name, row_id, deleted_at)
+        VALUES (TG_TABLE_NAME, OLD.id, timezone('utc', clock_timestamp()));
+        RETURN OLD;
+    END
+    $$ LANGUAGE plpgsql
+""").execute_if(dialect='postgresql'))
+for _table in (Venue.__table__, Artist.__table__, Show.__table__):
+    event.listen(_table, 'after_create', DDL(
+        f'CREATE TRIGGER "{_table.name}_tombstone" AFTER DELETE ON "{_table.name}" '
+        f'FOR EACH ROW EXECUTE PROCEDURE record_tombstone()'
+    ).execute_if(dialect='postgresql'))
+    # Microseconds padded to six digits, as SQLAlchemy stores datetimes in SQLite
+    event.listen(_table, 'after_create', DDL(
+        f'CREATE TRIGGER "{_table.name}_tombstone" AFTER DELETE ON "{_table.name}" BEGIN '
+        f'INSERT INTO "Tombstone" (table_name, row_id, deleted_at) '
+        f"VALUES ('{_table.name}', OLD.id, strftime('%%Y-%%m-%%d %%H:%%M:%%f', 'now') || '000'); END"
+    ).execute_if(dialect='sqlite'))
@@ -0,0 +1,96 @@
+import base64
+import json
+from datetime import datetime
+
+from app_config import db
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def page_size(limit):
+    # Falls back to the default for missing or malformed values and clamps oversized requests
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    # Returns None for anything that is not a cursor produced by encode_cursor for these columns
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        return None
+    if not isinstance(values, list) or len(values) != len(columns):
+        return None
+
+    decoded = []
+    for column, value in zip(columns, values):
+        # Key columns are NOT NULL, and a value of the wrong type would reach the database as is
+        python_type = column.type.python_type
+        if python_type is datetime:
+            try:
+                value = datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                return None
+        elif not isinstance(value, python_type) or isinstance(value, bool):
+            return None
+        decoded.append(value)
+    return decoded
+
+
+class KeysetPage(object):
+    """One page of rows plus the cursors needed to move forwards and backwards from it."""
+
+    def __init__(self, rows, next_cursor, prev_cursor, limit):
+        self.rows = rows
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.limit = limit
+
+
+def keyset_page(query, columns, after=None, before=None, limit=None):
+    """Seek to the rows following ``after`` (or preceding ``before``) in ``columns`` order.
+
+    The rows of ``query`` must expose every key column under the column's name.  The position is
+    filtered on the key tuple rather than skipped with OFFSET, so every page costs the same as the
+    first one.
+    """
+    limit = page_size(limit)
+    key = db.tuple_(*columns)
+
+    before_values = decode_cursor(before, columns)
+    after_values = decode_cursor(after, columns) if before_values is None else None
+
+    if before_values is not None:
+        rows = query.filter(key < db.tuple_(*before_values)) \
+            .order_by(*[column.desc() for column in columns]) \
+            .limit(limit + 1) \
+            .all()
+        has_more = len(rows) > limit
+        rows = rows[:limit][::-1]
+        has_next, has_prev = True, has_more
+    else:
+        if after_values is not None:
+            query = query.filter(key > db.tuple_(*after_values))
+        rows = query.order_by(*columns).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        has_next, has_prev = has_more, after_values is not None
+
+    def row_key(row):
+        return encode_cursor([getattr(row, column.key) for column in columns])
+
+    next_cursor = row_key(rows[-1]) if rows and has_next else None
+    prev_cursor = row_key(rows[0]) if rows and has_prev else None
+
+    return KeysetPage(rows, next_cursor, prev_cursor, limit)
@@ -0,0 +1,167 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import NullPool, Pool, QueuePool
+
+
+class PoolStats(object):
+    """Connection checkout counters shared by every engine of the process."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.timeouts = 0
+        self.invalidated = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def waited(self, seconds):
+        with self.lock:
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def count(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self):
+        return {
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "timeouts": self.timeouts,
+            "invalidated": self.invalidated,
+            "wait_seconds": round(self.wait_seconds, 6),
+            "max_wait_seconds": round(self.max_wait_seconds, 6),
+        }
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(QueuePool):
+    # Measures how long each checkout waits for a free connection, including for a new one to open
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except TimeoutError:
+            pool_stats.count('timeouts')
+            raise
+        finally:
+            pool_stats.waited(time.perf_counter() - started)
+
+
+def engine_options(config):
+    """Build ``SQLALCHEMY_ENGINE_OPTIONS`` from the ``DATABASE_*`` settings.
+
+    SQLite keeps Flask-SQLAlchemy's own pool choice; only the checkout counters apply to it.
+    """
+    url = config['SQLALCHEMY_DATABASE_URI']
+    options = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    if url.startswith('sqlite'):
+        return options
+
+    if config['DATABASE_PGBOUNCER']:
+        # PgBouncer owns the pool; a connection is opened per checkout and closed on checkin
+        options.setdefault('poolclass', NullPool)
+    else:
+        options.setdefault('poolclass', TimedQueuePool)
+        options.setdefault('pool_size', config['DATABASE_POOL_SIZE'])
+        options.setdefault('max_overflow', config['DATABASE_MAX_OVERFLOW'])
+        options.setdefault('pool_timeout', config['DATABASE_POOL_TIMEOUT'])
+        options.setdefault('pool_recycle', config['DATABASE_POOL_RECYCLE'])
+        options.setdefault('pool_pre_ping', config['DATABASE_POOL_PRE_PING'])
+
+        timeout = config['DATABASE_STATEMENT_TIMEOUT']
+        if timeout and url.startswith('postgres'):
+            # Sent as a startup parameter, so it costs no extra round trip per connection
+            connect_args = options.setdefault('connect_args', {})
+            connect_args['options'] = f"{connect_args.get('options', '')} -c statement_timeout={int(timeout)}".strip()
+    return options
+
+
+@event.listens_for(Pool, 'connect')
+def count_connect(*args):
+    pool_stats.count('connects')
+
+
+@event.listens_for(Pool, 'checkout')
+def count_checkout(*args):
+    pool_stats.count('checkouts')
+
+
+@event.listens_for(Pool, 'checkin')
+def count_checkin(*args):
+    pool_stats.count('checkins')
+
+
+@event.listens_for(Pool, 'invalidate')
+def count_invalidated(*args):
+    pool_stats.count('invalidated')
+
+
+@event.listens_for(Pool, 'connect')
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores foreign keys, including ON DELETE CASCADE, unless each connection turns them on
+    if 'sqlite' in type(dbapi_connection).__module__:
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+
+def init_pool(app):
+    app.config.setdefault('DATABASE_POOL_SIZE', 5)
+    app.config.setdefault('DATABASE_MAX_OVERFLOW', 10)
+    app.config.setdefault('DATABASE_POOL_TIMEOUT', 30)
+    app.config.setdefault('DATABASE_POOL_RECYCLE', 1800)
+    app.config.setdefault('DATABASE_POOL_PRE_PING', True)
+    app.config.setdefault('DATABASE_STATEMENT_TIMEOUT', 0)
+    app.config.setdefault('DATABASE_PGBOUNCER', False)
+
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    if app.config['DATABASE_PGBOUNCER']:
+        # Named cursors hold server-side state across statements, which PgBouncer cannot pin
+        app.config['SQLALCHEMY_SERVER_SIDE_CURSORS'] = False
+
+    timeout = app.config['DATABASE_STATEMENT_TIMEOUT']
+    if timeout and app.config['DATABASE_PGBOUNCER']:
+        # Behind PgBouncer in transaction mode neither startup parameters nor a session-level SET
+        # stick to the connection, so the timeout is scoped to each transaction instead
+        @event.listens_for(Engine, 'begin')
+        def set_statement_timeout(conn):
+            if conn.dialect.name == 'postgresql':
+                cursor = conn.connection.cursor()
+                cursor.execute(f'SET LOCAL statement_timeout = {int(timeout)}')
+                cursor.close()
+
+    app.extensions['pool_stats'] = pool_stats
+
+
+def pool_status(engine):
+    status = pool_stats.as_dict()
+    pool = engine.pool
+    status['pool'] = pool.__class__.__name__
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "idle": pool.checkedin(),
+        })
+    return status
+
+
+def dispose_inherited_connections(db, app):
+    """Forget the pooled connections a forked worker process inherited from its parent.
+
+    The parent keeps using them, so they are dropped without being closed; the worker opens its own.
+    """
+    for bind in [None] + list(app.config.get('SQLALCHEMY_BINDS') or ()):
+        db.get_engine(app, bind=bind).dispose(close=False)
@@ -0,0 +1,28 @@
+from app_config import db
+from models import Venue, Show
+from search import invalidate_search
+
+
+def purge_venues(batch_size=1000, on_batch=None):
+    """Delete soft-deleted venues, their shows ``batch_size`` rows per transaction.
+
+    Short transactions keep row locks and WAL bursts small however long a venue's history is.
+    Returns ``(venues, shows)`` deleted; ``on_batch`` is called with the running show count.
+    """
+    venues = shows = 0
+    for (venue_id,) in db.session.query(Venue.id).filter(Venue.deleted_at.isnot(None)).all():
+        while True:
+            batch = db.session.query(Show.id).filter(Show.venue_id == venue_id).limit(batch_size).subquery()
+            deleted = db.session.execute(Show.__table__.delete().where(Show.id.in_(db.select(batch.c.id)))).rowcount
+            db.session.commit()
+            shows += deleted
+            if on_batch is not None and deleted:
+                on_batch(shows)
+            if deleted < batch_size:
+                break
+
+        db.session.execute(Venue.__table__.delete().where(Venue.id == venue_id))
+        db.session.commit()
+        invalidate_search(Venue)
+        venues += 1
+    return venues, shows
@@ -0,0 +1,125 @@
+from app_config import db
+from models import Venue, Artist, Show
+
+# Keyset order of each listing; every listing query exposes these columns under their own names
+VENUE_LISTING_ORDER = [Venue.state, Venue.city, Venue.id]
+ARTIST_LISTING_ORDER = [Artist.id]
+SHOW_LISTING_ORDER = [Show.start_time, Show.id]
+
+# Soft-deleted venues, and their shows, are hidden from every page until `flask purge-venues` removes them.
+# The aliased subquery stays uncorrelated in queries that also select from Venue.
+LIVE_VENUE = Venue.deleted_at.is_(None)
+_deleted_venue = Venue.__table__.alias('deleted_venue')
+LIVE_SHOW = Show.venue_id.notin_(db.select(_deleted_venue.c.id).where(_deleted_venue.c.deleted_at.isnot(None)))
+
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def venue_listing_query():
+    # Upcoming show counts are read from the venue's counter column, so no Show rows are touched
+    return db.session.query(
+        Venue.city,
+        Venue.state,
+        Venue.id,
+        Venue.name,
+        Venue.updated_at,
+        Venue.upcoming_shows_count.label('num_upcoming_shows')
+    ).filter(LIVE_VENUE)
+
+
+def artist_listing_query():
+    return db.session.query(Artist.id, Artist.name, Artist.updated_at)
+
+
+def show_listing_query():
+    return db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.updated_at,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Venue.updated_at.label('venue_updated_at'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Artist.updated_at.label('artist_updated_at')
+    ).join(Venue, db.and_(Show.venue_id == Venue.id, LIVE_VENUE)) \
+        .join(Artist, Show.artist_id == Artist.id)
+
+
+def venue_detail_query(venue_id):
+    # The venue, its shows and each show's artist come back from one joined query.  The outer joins
+    # keep the venue row when it has no shows, in which case the show columns are None.
+    return db.session.query(
+        Venue,
+        Show.start_time,
+        Show.updated_at.label('show_updated_at'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Artist.updated_at.label('artist_updated_at')
+    ).outerjoin(Show, Show.venue_id == Venue.id) \
+        .outerjoin(Artist, Show.artist_id == Artist.id) \
+        .filter(Venue.id == venue_id, LIVE_VENUE) \
+        .order_by(Show.start_time)
+
+
+def artist_detail_query(artist_id):
+    # The artist, its shows and each show's venue come back from one joined query
+    return db.session.query(
+        Artist,
+        Show.start_time,
+        Show.updated_at.label('show_updated_at'),
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Venue.image_link.label('venue_image_link'),
+        Venue.updated_at.label('venue_updated_at')
+    ).select_from(Artist) \
+        .outerjoin(Show, db.and_(Show.artist_id == Artist.id, LIVE_SHOW)) \
+        .outerjoin(Venue, Show.venue_id == Venue.id) \
+        .filter(Artist.id == artist_id) \
+        .order_by(Show.start_time)
+
+
+def venue_shows_query(venue_id):
+    # A venue's shows with their artists, for callers that load the venue row on its own; the
+    # columns are named like venue_detail_query's
+    return db.session.query(
+        Show.start_time,
+        Show.updated_at.label('show_updated_at'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+        Artist.updated_at.label('artist_updated_at')
+    ).join(Artist, Show.artist_id == Artist.id) \
+        .filter(Show.venue_id == venue_id) \
+        .order_by(Show.start_time)
+
+
+def artist_shows_query(artist_id):
+    return db.session.query(
+        Show.start_time,
+        Show.updated_at.label('show_updated_at'),
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Venue.image_link.label('venue_image_link'),
+        Venue.updated_at.label('venue_updated_at')
+    ).join(Venue, db.and_(Show.venue_id == Venue.id, LIVE_VENUE)) \
+        .filter(Show.artist_id == artist_id) \
+        .order_by(Show.start_time)
+
+
+def name_choices_query(model):
+    # (id, name) pairs for select fields, without loading whole rows
+    query = db.session.query(model.id, model.name).order_by(model.name, model.id)
+    return query.filter(LIVE_VENUE) if model is Venue else query
+
+
+def name_prefix_query(model, prefix):
+    # Served by the lower(name) text_pattern_ops index
+    query = db.session.query(model.id, model.name) \
+        .filter(db.func.lower(model.name).like(escape_like(prefix.lower()) + '%', escape='\\')) \
+        .order_by(db.func.lower(model.name), model.id)
+    return query.filter(LIVE_VENUE) if model is Venue else query
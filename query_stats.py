@@ -0,0 +1,90 @@
+import time
+from collections import Counter
+
+from flask import g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g.query_count = g.get('query_count', 0) + 1
+        # Statements differing only in their parameters share a shape; one repeated many times is an N+1
+        if 'query_shapes' not in g:
+            g.query_shapes = Counter()
+        g.query_shapes[' '.join(statement.split())] += 1
+    conn.info['query_started'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def time_query(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_started', None)
+    if started is not None and has_app_context():
+        g.query_seconds = g.get('query_seconds', 0.0) + time.perf_counter() - started
+
+
+def query_count():
+    return g.get('query_count', 0)
+
+
+def query_seconds():
+    return g.get('query_seconds', 0.0)
+
+
+def repeated_queries(limit):
+    """Statement shapes executed more than ``limit`` times in this request, most repeated first."""
+    return [(shape, count) for shape, count in g.get('query_shapes', Counter()).most_common() if count > limit]
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(budget):
+    """Declare the most SQL statements a view may execute per request.
+
+    Going over is logged, and fails the request when ``QUERY_BUDGET_STRICT`` is set or the app is
+    testing, so an N+1 creeping back into a page breaks the test suite.
+    """
+    def decorator(view):
+        view.query_budget = budget
+        return view
+    return decorator
+
+
+def _describe(repeats):
+    return '; '.join(f'{count}x {shape[:200]}' for shape, count in repeats)
+
+
+def init_query_stats(app):
+    app.config.setdefault('QUERY_BUDGET_STRICT', False)
+    app.config.setdefault('QUERY_REPEAT_LIMIT', 5)
+
+    # g belongs to the app context, which requests share when one is already pushed (tests, the CLI)
+    @app.before_request
+    def reset_query_stats():
+        for name in ('query_count', 'query_shapes', 'query_seconds'):
+            g.pop(name, None)
+
+    @app.after_request
+    def check_query_budget(response):
+        repeats = repeated_queries(app.config['QUERY_REPEAT_LIMIT'])
+        if repeats:
+            app.logger.warning(f'{request.method} {request.path} repeated statements: {_describe(repeats)}')
+
+        budget = getattr(app.view_functions.get(request.endpoint), 'query_budget', None)
+        if budget is not None and query_count() > budget:
+            message = f'{request.method} {request.path} executed {query_count()} statements, budget is {budget}'
+            if repeats:
+                message += f'; repeated: {_describe(repeats)}'
+            if app.config['QUERY_BUDGET_STRICT'] or app.testing:
+                raise QueryBudgetExceeded(message)
+            app.logger.warning(message)
+        return response
+
+    # Every response reports how many statements were executed to build it
+    @app.after_request
+    def add_query_count_header(response):
+        response.headers['X-Query-Count'] = str(query_count())
+        return response
@@ -0,0 +1,74 @@
+import time
+
+from flask import g, request, has_request_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, orm
+
+# SQLALCHEMY_BINDS key of the replica engine
+REPLICA_BIND = 'replica'
+
+# Cookie holding the time until which a visitor who just wrote keeps reading from the primary
+STICKY_COOKIE = 'read_primary_until'
+
+
+class RoutingSession(SignallingSession):
+    """Session that reads from the replica during requests routed to it.
+
+    Flushes, and every statement outside such a request, go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None):
+        if not self._flushing and has_request_context() and g.get('use_replica'):
+            return get_state(self.app).db.get_engine(self.app, bind=REPLICA_BIND)
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def remember_write(session):
+    if has_request_context():
+        g.wrote = True
+
+
+def read_only(view):
+    """Mark a POST view that only reads, such as a search, so it may run on the replica."""
+    view.read_only = True
+    return view
+
+
+def _sticky(cookie):
+    try:
+        return float(cookie) > time.time()
+    except (TypeError, ValueError):
+        return False
+
+
+def init_replica(app):
+    app.config.setdefault('DATABASE_REPLICA_URL', None)
+    app.config.setdefault('REPLICA_STICKY_SECONDS', 10)
+
+    url = app.config['DATABASE_REPLICA_URL']
+    if not url:
+        return
+    app.config['SQLALCHEMY_BINDS'] = dict(app.config.get('SQLALCHEMY_BINDS') or {}, **{REPLICA_BIND: url})
+
+    @app.before_request
+    def route_reads():
+        view = app.view_functions.get(request.endpoint)
+        reads = request.method in ('GET', 'HEAD') or getattr(view, 'read_only', False)
+        g.read_primary = _sticky(request.cookies.get(STICKY_COOKIE))
+        g.use_replica = reads and not g.read_primary
+        g.wrote = False
+
+    @app.after_request
+    def stick_to_primary(response):
+        # Read-your-writes: replication lag must not hide a visitor's own change from them
+        if g.get('wrote'):
+            seconds = app.config['REPLICA_STICKY_SECONDS']
+            response.set_cookie(STICKY_COOKIE, str(time.time() + seconds), max_age=seconds, httponly=True)
+        return response
@@ -0,0 +1,181 @@
+import time
+
+from flask import current_app
+from sqlalchemy import event
+
+from app_config import db
+from models import Venue, Artist
+from queries import LIVE_VENUE, escape_like
+
+SEARCHABLE_MODELS = (Venue, Artist)
+
+# Bumped by every write to a searchable model in this process; ngram indexes built before the
+# latest bump are rebuilt on their next search
+_generations = {model: 0 for model in SEARCHABLE_MODELS}
+
+
+def invalidate_search(model):
+    """Mark ``model``'s search indexes in this process stale.
+
+    ORM writes do this by themselves; call it after Core statements and bulk updates, which fire no
+    ORM events.
+    """
+    _generations[model] += 1
+
+
+# Registered once here rather than per app, so creating apps neither stacks listeners nor keeps
+# their indexes alive
+for _model in SEARCHABLE_MODELS:
+    for _event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event_name, lambda mapper, connection, target, model=_model: invalidate_search(model))
+
+
+def live_filter(model):
+    return (LIVE_VENUE,) if model is Venue else ()
+
+
+def trigrams(text):
+    # Same padding as pg_trgm so both backends rank names alike
+    padded = f'  {text.lower()} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(left, right):
+    left, right = trigrams(left), trigrams(right)
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+class SearchResults(object):
+
+    def __init__(self, count, data):
+        self.count = count
+        self.data = data
+
+
+class PostgresTrigramSearch(object):
+    """Substring search served by the pg_trgm GIN index on ``name``.
+
+    Matching, ranking by trigram similarity, the total match count and each result's upcoming
+    show count all come back from one query.
+    """
+
+    def query(self, model, term, limit):
+        return db.session.query(
+            model.id,
+            model.name,
+            model.upcoming_shows_count.label('num_upcoming_shows'),
+            db.func.count().over().label('total')
+        ).filter(model.name.ilike('%' + escape_like(term) + '%', escape='\\'), *live_filter(model)) \
+            .order_by(db.func.similarity(model.name, term).desc(), model.name, model.id) \
+            .limit(limit)
+
+    def results(self, rows):
+        data = [{"id": row.id, "name": row.name, "num_upcoming_shows": row.num_upcoming_shows} for row in rows]
+        return SearchResults(rows[0].total if rows else 0, data)
+
+    def search(self, model, term, limit):
+        return self.results(self.query(model, term, limit).all())
+
+
+class NgramIndex(object):
+    """In-process trigram inverted index over one model's names."""
+
+    def __init__(self, model, max_age):
+        self.model = model
+        self.max_age = max_age
+        self.names = {}
+        self.postings = {}
+        self.built_at = None
+        self.generation = None
+
+    def _build(self):
+        # Taken before reading, so a write that lands during the build triggers another one
+        generation = _generations[self.model]
+        names = {}
+        postings = {}
+        for row in db.session.query(self.model.id, self.model.name).filter(*live_filter(self.model)):
+            name = (row.name or '').lower()
+            names[row.id] = name
+            for gram in trigrams(name):
+                postings.setdefault(gram, set()).add(row.id)
+        self.names, self.postings = names, postings
+        self.built_at = time.monotonic()
+        self.generation = generation
+
+    def match(self, term):
+        # Writes made by this process invalidate the index straight away; the age limit picks up
+        # rows written by other processes
+        if self.generation != _generations[self.model] or time.monotonic() - self.built_at > self.max_age:
+            self._build()
+
+        term = term.lower()
+        if len(term) < 3:
+            candidates = self.names.keys()
+        else:
+            # Any name containing the term contains every three-character slice of it
+            grams = {term[i:i + 3] for i in range(len(term) - 2)}
+            postings = sorted((self.postings.get(gram, set()) for gram in grams), key=len)
+            candidates = set.intersection(*postings)
+
+        return [row_id for row_id in candidates if term in self.names[row_id]]
+
+
+class NgramSearch(object):
+    """Fallback for SQLite and tests, where pg_trgm is not available."""
+
+    def __init__(self, max_age=60):
+        self.indexes = {model: NgramIndex(model, max_age) for model in SEARCHABLE_MODELS}
+
+    def search(self, model, term, limit):
+        index = self.indexes[model]
+        matches = index.match(term)
+        ranked = sorted(matches, key=lambda row_id: (-similarity(index.names[row_id], term), index.names[row_id], row_id))
+        ranked = ranked[:limit]
+        if not ranked:
+            return SearchResults(0, [])
+
+        # Upcoming show counts for the whole page come back from one primary key lookup
+        rows = db.session.query(
+            model.id,
+            model.name,
+            model.upcoming_shows_count.label('num_upcoming_shows')
+        ).filter(model.id.in_(ranked), *live_filter(model)).all()
+
+        rows_by_id = {row.id: row for row in rows}
+        data = []
+        for row_id in ranked:
+            row = rows_by_id.get(row_id)
+            if row is not None:
+                data.append({"id": row.id, "name": row.name, "num_upcoming_shows": row.num_upcoming_shows})
+        return SearchResults(len(matches), data)
+
+
+def init_search(app):
+    app.config.setdefault('SEARCH_BACKEND', 'auto')
+    app.config.setdefault('SEARCH_RESULT_LIMIT', 50)
+    app.config.setdefault('SEARCH_INDEX_MAX_AGE', 60)
+    app.extensions['search'] = None
+
+
+def search_backend():
+    app = current_app._get_current_object()
+    backend = app.extensions.get('search')
+    if backend is None:
+        name = app.config['SEARCH_BACKEND']
+        if name == 'auto':
+            name = 'postgres' if db.engine.dialect.name == 'postgresql' else 'ngram'
+
+        if name == 'postgres':
+            backend = PostgresTrigramSearch()
+        elif name == 'ngram':
+            backend = NgramSearch(max_age=app.config['SEARCH_INDEX_MAX_AGE'])
+        else:
+            raise ValueError(f'Unknown SEARCH_BACKEND {name!r}')
+        app.extensions['search'] = backend
+    return backend
+
+
+def search(model, term):
+    return search_backend().search(model, term, current_app.config['SEARCH_RESULT_LIMIT'])
@@ -0,0 +1,123 @@
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from app_config import db
+from counters import recount
+from models import Venue, Artist, Show
+
+# (city, state, relative weight): a few large markets hold most of the catalog, as in real listings
+CITIES = [
+    ('New York', 'NY', 30),
+    ('Los Angeles', 'CA', 22),
+    ('Chicago', 'IL', 12),
+    ('San Francisco', 'CA', 9),
+    ('Nashville', 'TN', 8),
+    ('Austin', 'TX', 7),
+    ('Seattle', 'WA', 5),
+    ('New Orleans', 'LA', 4),
+    ('Portland', 'OR', 3),
+    ('Denver', 'CO', 3),
+    ('Atlanta', 'GA', 2),
+    ('Boston', 'MA', 2),
+    ('Minneapolis', 'MN', 1),
+    ('Detroit', 'MI', 1),
+    ('Memphis', 'TN', 1),
+    ('Asheville', 'NC', 1),
+]
+
+GENRES = ['Alternative', 'Blues', 'Classical', 'Country', 'Folk', 'Jazz', 'Pop', 'Rock n Roll', 'Soul']
+
+BATCH_SIZE = 10000
+
+# Show start times: 20% in the coming month, 30% later in the coming year, the rest spread over
+# the past three years
+SHOW_WINDOWS = [
+    (0.2, 0, 30),
+    (0.3, 30, 365),
+    (0.5, -3 * 365, 0),
+]
+
+
+def _insert(table, rows):
+    rows = iter(rows)
+    while True:
+        batch = [row for _, row in zip(range(BATCH_SIZE), rows)]
+        if not batch:
+            return
+        db.session.execute(table.insert(), batch)
+
+
+def _zipf_weights(count, exponent=1.0):
+    # Cumulative weights of a Zipf distribution: the first rows get most of the picks
+    return list(accumulate(1.0 / (rank + 1) ** exponent for rank in range(count)))
+
+
+def _start_time(rnd, now):
+    share = rnd.random()
+    for weight, first_day, last_day in SHOW_WINDOWS:
+        if share < weight:
+            break
+        share -= weight
+    day = now.date() + timedelta(days=rnd.randint(first_day, last_day))
+    # Mostly evening shows, and more of them on Fridays and Saturdays
+    if day.weekday() < 4 and rnd.random() < 0.4:
+        day += timedelta(days=rnd.choice([4, 5]) - day.weekday())
+    return datetime.combine(day, datetime.min.time()) + timedelta(hours=rnd.choice([18, 19, 20, 20, 21, 21, 22]),
+                                                                  minutes=rnd.choice([0, 0, 15, 30, 45]))
+
+
+def _places(rnd, count):
+    weights = list(accumulate(weight for _, _, weight in CITIES))
+    return [place[:2] for place in rnd.choices(CITIES, cum_weights=weights, k=count)]
+
+
+def seed_dataset(venues=100, artists=200, shows=1000, seed=0):
+    """Insert a synthetic catalog of venues, artists and shows and commit it.
+
+    Cities, venue and artist popularity follow a skewed distribution, and show dates cluster in the
+    coming weeks and at weekends, so large catalogs load the listings the way real data would.
+    Rows are generated and inserted in batches, so millions of shows fit in memory.  Meant for
+    scratch databases used by the EXPLAIN check, local profiling and the benchmarks.
+    """
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+
+    _insert(Venue.__table__, ({
+        "name": f"Venue {i}",
+        "city": city,
+        "state": state,
+        "address": f"{rnd.randint(1, 9999)} Main Street",
+        "phone": "555-555-5555",
+        "genres": rnd.sample(GENRES, 2),
+        "seeking_talent": rnd.random() < 0.5,
+    } for i, (city, state) in enumerate(_places(rnd, venues))))
+
+    _insert(Artist.__table__, ({
+        "name": f"Artist {i}",
+        "city": city,
+        "state": state,
+        "phone": "555-555-5555",
+        "genres": rnd.sample(GENRES, 2),
+        "seeking_venue": rnd.random() < 0.5,
+    } for i, (city, state) in enumerate(_places(rnd, artists))))
+
+    venue_ids = [row.id for row in db.session.query(Venue.id)]
+    artist_ids = [row.id for row in db.session.query(Artist.id)]
+    # Popularity is independent of insertion order
+    rnd.shuffle(venue_ids)
+    rnd.shuffle(artist_ids)
+    venue_weights = _zipf_weights(len(venue_ids), 0.8)
+    artist_weights = _zipf_weights(len(artist_ids))
+
+    def show_rows():
+        for start in range(0, shows, BATCH_SIZE):
+            size = min(BATCH_SIZE, shows - start)
+            for venue_id, artist_id in zip(rnd.choices(venue_ids, cum_weights=venue_weights, k=size),
+                                           rnd.choices(artist_ids, cum_weights=artist_weights, k=size)):
+                yield {"venue_id": venue_id, "artist_id": artist_id, "start_time": _start_time(rnd, now)}
+
+    _insert(Show.__table__, show_rows())
+
+    # The rows went in through Core, around the show counters
+    recount(now)
@@ -0,0 +1,194 @@
+import os
+import secrets
+import time
+import zlib
+from datetime import datetime
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+from app_config import db
+from models import WebSession
+
+# Session payloads at least this long are stored zlib-compressed
+COMPRESS_MIN_BYTES = 512
+
+
+def load_secret_key(app):
+    """Set ``SECRET_KEY`` from the file named by ``SECRET_KEY_FILE`` when it is not set directly.
+
+    Every worker and node must sign cookies with the same key, so the app refuses to start without
+    one.  Only debug mode, tests and the single-process ``flask`` commands make up a random key.
+    """
+    if not app.config.get('SECRET_KEY') and app.config.get('SECRET_KEY_FILE'):
+        with open(app.config['SECRET_KEY_FILE'], 'rb') as file:
+            app.config['SECRET_KEY'] = file.read().strip()
+    if not app.config.get('SECRET_KEY'):
+        if not (app.debug or app.testing or os.environ.get('FLASK_RUN_FROM_CLI') == 'true'):
+            raise RuntimeError('SECRET_KEY is not set; set it or SECRET_KEY_FILE, with the same key for every '
+                               'worker, or sessions and flashed messages break between workers')
+        app.config['SECRET_KEY'] = secrets.token_bytes(32)
+
+
+def _pack(session):
+    data = session_json_serializer.dumps(dict(session)).encode('utf-8')
+    if len(data) >= COMPRESS_MIN_BYTES:
+        return b'z' + zlib.compress(data)
+    return b'j' + data
+
+
+def _unpack(value):
+    data = zlib.decompress(value[1:]) if value[:1] == b'z' else value[1:]
+    return session_json_serializer.loads(data.decode('utf-8'))
+
+
+class DatabaseStore(object):
+    """Sessions in the WebSession table, reached through the primary so a new flash is never missed.
+
+    Expired rows are swept every ``sweep_interval`` seconds by whichever request saves a session,
+    ``sweep_batch`` rows at a time; ``flask sweep-sessions`` does the same from cron.
+    """
+
+    def __init__(self, sweep_interval=300, sweep_batch=1000):
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+        self.next_sweep = time.monotonic() + sweep_interval
+
+    def load(self, sid):
+        table = WebSession.__table__
+        with db.engine.connect() as connection:
+            return connection.execute(
+                db.select(table.c.data).where(table.c.id == sid, table.c.expires_at > datetime.utcnow())
+            ).scalar()
+
+    def save(self, sid, value, lifetime):
+        table = WebSession.__table__
+        values = {"data": value, "expires_at": datetime.utcnow() + lifetime}
+        with db.engine.begin() as connection:
+            if not connection.execute(table.update().where(table.c.id == sid).values(values)).rowcount:
+                connection.execute(table.insert().values(id=sid, **values))
+
+        if time.monotonic() >= self.next_sweep:
+            self.next_sweep = time.monotonic() + self.sweep_interval
+            self.sweep()
+
+    def delete(self, sid):
+        table = WebSession.__table__
+        with db.engine.begin() as connection:
+            connection.execute(table.delete().where(table.c.id == sid))
+
+    def sweep(self):
+        """Delete expired sessions in batches, each in its own transaction; returns how many went."""
+        table = WebSession.__table__
+        deleted = 0
+        while True:
+            expired = db.select(table.c.id).where(table.c.expires_at <= datetime.utcnow()) \
+                .limit(self.sweep_batch).scalar_subquery()
+            with db.engine.begin() as connection:
+                count = connection.execute(table.delete().where(table.c.id.in_(expired))).rowcount
+            deleted += count
+            if count < self.sweep_batch:
+                return deleted
+
+
+class RedisStore(object):
+    """Sessions as Redis keys that expire with the session, so there is nothing to sweep."""
+
+    def __init__(self, url, prefix='fyyur:session:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('SESSION_BACKEND=redis requires the redis package')
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def load(self, sid):
+        return self.client.get(self.prefix + sid)
+
+    def save(self, sid, value, lifetime):
+        self.client.set(self.prefix + sid, value, ex=lifetime)
+
+    def delete(self, sid):
+        self.client.delete(self.prefix + sid)
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(session):
+            session.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keeps session data in a store; the cookie only carries the signed session id.
+
+    Requests without a session cookie never touch the store, and a session is only written when
+    it changed (or when a permanent session is refreshed), so browsing costs no extra round trip.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def signer(self, app):
+        return Signer(app.secret_key, salt='session-id')
+
+    def open_session(self, app, request):
+        cookie = request.cookies.get(app.session_cookie_name)
+        if cookie:
+            try:
+                sid = self.signer(app).unsign(cookie).decode('ascii')
+            except BadSignature:
+                sid = None
+            value = self.store.load(sid) if sid else None
+            if value is not None:
+                return ServerSideSession(_unpack(value), sid=sid)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if not session:
+            # Emptied, e.g. once its last flashed message was shown
+            if session.modified and not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(app.session_cookie_name, domain=domain, path=path)
+            return
+
+        if not self.should_set_cookie(app, session):
+            return
+        self.store.save(session.sid, _pack(session), app.permanent_session_lifetime)
+        response.set_cookie(
+            app.session_cookie_name,
+            self.signer(app).sign(session.sid.encode('ascii')).decode('ascii'),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app))
+
+
+def init_sessions(app):
+    app.config.setdefault('SESSION_BACKEND', 'cookie')
+    app.config.setdefault('SESSION_REDIS_URL', 'redis://localhost:6379/0')
+    app.config.setdefault('SESSION_SWEEP_INTERVAL', 300)
+    load_secret_key(app)
+
+    backend = app.config['SESSION_BACKEND']
+    if backend == 'database':
+        store = DatabaseStore(app.config['SESSION_SWEEP_INTERVAL'])
+    elif backend == 'redis':
+        store = RedisStore(app.config['SESSION_REDIS_URL'])
+    elif backend == 'cookie':
+        # Flask's own signed cookie
+        return
+    else:
+        raise ValueError(f'Unknown SESSION_BACKEND {backend!r}')
+    app.session_interface = ServerSideSessionInterface(store)
+    app.extensions['session_store'] = store
@@ -2,3 +2,27 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Fills a select with the names matching what is typed into its search box, for catalogs too large to
+// embed in the page
+document.querySelectorAll('[data-autocomplete]').forEach(function (input) {
+  var select = document.getElementById(input.getAttribute('data-autocomplete-target'));
+  var timer = null;
+  input.addEventListener('input', function () {
+    clearTimeout(timer);
+    timer = setTimeout(function () {
+      var url = input.getAttribute('data-autocomplete') + '?q=' + encodeURIComponent(input.value.trim());
+      fetch(url).then(function (response) {
+        return response.json();
+      }).then(function (body) {
+        select.innerHTML = '';
+        body.data.forEach(function (row) {
+          var option = document.createElement('option');
+          option.value = row.id;
+          option.textContent = row.name + ' (' + row.id + ')';
+          select.appendChild(option);
+        });
+      });
+    }, 200);
+  });
+});
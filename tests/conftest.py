@@ -0,0 +1,35 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# config.py reads the environment when the app is created
+DATABASE = os.path.join(tempfile.mkdtemp(prefix='fyyur-tests-'), 'test.db')
+os.environ['DATABASE_URL'] = 'sqlite:///' + DATABASE
+os.environ['CACHE_BACKEND'] = 'null'
+os.environ['SECRET_KEY'] = 'tests'
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app
+    from app_config import db
+    from seed import seed_dataset
+
+    app = create_app()
+    app.config['TESTING'] = True
+    app.config['WTF_CSRF_ENABLED'] = False
+    with app.app_context():
+        db.create_all()
+        seed_dataset(venues=20, artists=30, shows=200)
+        db.session.remove()
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,45 @@
+"""Page cache: pages are served from the cache until a write invalidates them."""
+import pytest
+
+from app_config import db, cache
+from cache import LRUBackend
+from models import Venue
+
+
+@pytest.fixture
+def page_cache(monkeypatch):
+    # The test configuration turns caching off
+    monkeypatch.setattr(cache, 'backend', LRUBackend())
+    return cache
+
+
+def edited_venue(name):
+    return {"name": name, "city": 'Bergen', "state": 'NY', "address": '1 Quay', "phone": '', "genres": ['Jazz'],
+            "website": '', "facebook_link": '', "image_link": '', "seeking_description": ''}
+
+
+@pytest.mark.parametrize('path', ['/venues/{venue_id}', '/venues'], ids=['venue', 'listing'])
+def test_write_invalidates_cached_pages(app, page_cache, path):
+    with app.app_context():
+        venue = Venue(name=f'Cached Hall {path}', city='Bergen', state='NY', genres=['Jazz'])
+        db.session.add(venue)
+        db.session.commit()
+        venue_id, name = venue.id, venue.name
+    path = path.format(venue_id=venue_id)
+
+    reader = app.test_client()
+    first = reader.get(path)
+    assert first.headers['X-Cache'] == 'MISS'
+    assert name in first.get_data(as_text=True)
+    second = reader.get(path)
+    assert second.headers['X-Cache'] == 'HIT'
+    assert second.get_data() == first.get_data()
+
+    # The writer has a flash message pending, so it reads around the cache; the reader must not
+    writer = app.test_client()
+    assert writer.post(f'/venues/{venue_id}/edit', data=edited_venue(name + ' Renamed')).status_code == 302
+
+    third = reader.get(path)
+    assert third.headers['X-Cache'] == 'MISS'
+    assert name + ' Renamed' in third.get_data(as_text=True)
+    assert reader.get(path).headers['X-Cache'] == 'HIT'
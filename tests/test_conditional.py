@@ -0,0 +1,46 @@
+"""Conditional GETs: pages answer 304 while the client's copy is current, and only then."""
+from app_config import db
+from models import Venue, Artist
+
+
+def test_venue_page_not_modified_until_edited(app, client):
+    with app.app_context():
+        venue = Venue(name='Etag Hall', city='Bergen', state='NY', genres=['Jazz'])
+        db.session.add(venue)
+        db.session.commit()
+        venue_id = venue.id
+
+    first = client.get(f'/venues/{venue_id}')
+    etag = first.headers['ETag']
+
+    cached = client.get(f'/venues/{venue_id}', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.get_data() == b''
+    assert cached.headers['ETag'] == etag
+
+    with app.app_context():
+        db.session.get(Venue, venue_id).name = 'Etag Hall Renamed'
+        db.session.commit()
+
+    changed = client.get(f'/venues/{venue_id}', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert 'Etag Hall Renamed' in changed.get_data(as_text=True)
+
+
+def test_listing_etag_follows_next_link(app, client):
+    with app.app_context():
+        count = db.session.query(Artist).count()
+
+    # A page holding every artist: adding one leaves its rows alone but gives it a next link
+    path = f'/artists?limit={count}'
+    etag = client.get(path).headers['ETag']
+    assert client.get(path, headers={'If-None-Match': etag}).status_code == 304
+
+    with app.app_context():
+        db.session.add(Artist(name='Etag Band', city='Bergen', state='NY', genres=['Jazz']))
+        db.session.commit()
+
+    response = client.get(path, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'after=' in response.get_data(as_text=True)
@@ -0,0 +1,43 @@
+"""Show counters: kept by count_shows and roll_shows, and equal to a full recount."""
+from datetime import datetime, timedelta
+
+from app_config import db
+from counters import count_shows, roll_shows, recount
+from models import Venue, Artist, Show
+
+
+def counters(model):
+    rows = db.session.query(model.id, model.upcoming_shows_count, model.past_shows_count)
+    return {row_id: (upcoming, past) for row_id, upcoming, past in rows}
+
+
+def test_roll_shows_moves_started_shows_to_past(app):
+    now = datetime.utcnow()
+    with app.app_context():
+        # Counted as of an hour ago, so a show starting half an hour ago is still upcoming
+        recount(now - timedelta(hours=1))
+
+        venue = Venue(name='Counted Hall', city='Bergen', state='NY', genres=['Jazz'])
+        artist = Artist(name='Counted Band', city='Bergen', state='NY', genres=['Jazz'])
+        db.session.add_all([venue, artist])
+        db.session.flush()
+        shows = [(venue.id, artist.id, now - timedelta(minutes=30)), (venue.id, artist.id, now + timedelta(days=1))]
+        db.session.add_all([Show(venue_id=venue_id, artist_id=artist_id, start_time=start_time)
+                            for venue_id, artist_id, start_time in shows])
+        count_shows(shows)
+        db.session.commit()
+
+        assert (venue.upcoming_shows_count, venue.past_shows_count) == (2, 0)
+        assert (artist.upcoming_shows_count, artist.past_shows_count) == (2, 0)
+
+        assert roll_shows(now) >= 1
+        db.session.refresh(venue)
+        db.session.refresh(artist)
+        assert (venue.upcoming_shows_count, venue.past_shows_count) == (1, 1)
+        assert (artist.upcoming_shows_count, artist.past_shows_count) == (1, 1)
+
+        # A second run finds nothing new, and every counter agrees with one computed from scratch
+        assert roll_shows(now) == 0
+        kept = {model: counters(model) for model in (Venue, Artist)}
+        recount(now)
+        assert {model: counters(model) for model in (Venue, Artist)} == kept
@@ -0,0 +1,83 @@
+"""Snapshot export: Parquet schemas and incremental runs."""
+import csv
+from datetime import datetime, timedelta
+
+import pytest
+
+from app_config import db
+from export import ParquetWriter, export_table, export_deletions
+from models import Venue, Artist, Show
+
+
+def venue_row(id, **values):
+    row = dict({column.name: None for column in Venue.__table__.columns},
+               id=id, name=f'Venue {id}', city='City', state='CA', genres=['Jazz'], updated_at=datetime(2024, 1, id),
+               upcoming_shows_count=0, past_shows_count=0, **values)
+    return tuple(row[column.name] for column in Venue.__table__.columns)
+
+
+def test_parquet_schema_does_not_depend_on_the_first_batch(tmp_path):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    path = str(tmp_path / 'venues.parquet')
+
+    # Nothing in the first batch is deleted or has a website, so those columns are all None there
+    writer = ParquetWriter(path, list(Venue.__table__.columns))
+    writer.write_batch([venue_row(1), venue_row(2)])
+    writer.write_batch([venue_row(3, deleted_at=datetime(2024, 2, 1), website='https://example.com')])
+    writer.close()
+
+    table = parquet.read_table(path)
+    assert table.num_rows == 3
+    assert str(table.schema.field('deleted_at').type) == 'timestamp[us]'
+    assert table.column('deleted_at').to_pylist() == [None, None, datetime(2024, 2, 1)]
+    assert table.column('website').to_pylist() == [None, None, 'https://example.com']
+    assert table.column('genres').to_pylist() == [['Jazz']] * 3
+
+
+def csv_ids(path):
+    with open(path, newline='') as file:
+        return [int(row['id']) for row in csv.DictReader(file)]
+
+
+def test_incremental_export_and_deletions(app, client, tmp_path):
+    # No settle window: everything committed before each run is exported by it
+    def run(kind, since, export=export_table):
+        # A directory per run, as file names only differ by the second
+        directory = tmp_path / str(len(list(tmp_path.iterdir())))
+        directory.mkdir()
+        paths, rows, watermark = export(kind, str(directory), since=since, overlap=timedelta(0))
+        path = paths if isinstance(paths, str) else paths[0]
+        ids = csv_ids(path)
+        assert len(ids) == rows
+        return ids, watermark
+
+    with app.app_context():
+        everything, venues_since = run('venues', None)
+        assert len(everything) == db.session.query(Venue).count()
+        _, shows_since = run('shows', None)
+        _, deleted_since = run('venues', None, export_deletions)
+        _, deleted_shows_since = run('shows', None, export_deletions)
+
+        venue = Venue(name='Exported Hall', city='Bergen', state='NY', genres=['Jazz'])
+        db.session.add(venue)
+        db.session.flush()
+        artist_id = db.session.query(Artist.id).order_by(Artist.id).first().id
+        show = Show(venue_id=venue.id, artist_id=artist_id, start_time=datetime.utcnow() + timedelta(days=1))
+        db.session.add(show)
+        db.session.commit()
+        venue_id, show_id = venue.id, show.id
+
+        changed, venues_since = run('venues', venues_since)
+        assert changed == [venue_id]
+        assert run('shows', shows_since)[0] == [show_id]
+        # The next run starts where this one stopped
+        assert run('venues', venues_since)[0] == []
+        db.session.remove()
+
+    # Deleted outright; the show goes with it by ON DELETE CASCADE
+    assert client.delete(f'/venues/{venue_id}').status_code == 204
+
+    with app.app_context():
+        assert run('venues', venues_since)[0] == []
+        assert run('venues', deleted_since, export_deletions)[0] == [venue_id]
+        assert run('shows', deleted_shows_since, export_deletions)[0] == [show_id]
@@ -0,0 +1,46 @@
+"""Bulk import over HTTP: batch sizes and the report of rejected rows."""
+import json
+
+import pytest
+
+from app_config import db
+from models import Artist
+
+ARTIST_CSV = 'name,city,state,phone,genres,facebook_link\nImported Artist,Oslo,NY,,Jazz,\n'
+REPORTED_ARTIST = {"city": 'Oslo', "state": 'NY', "genres": ['Jazz'],
+                   "facebook_link": 'https://facebook.com/band', "website": 'https://band.example.com'}
+
+
+def artist_count(app):
+    with app.app_context():
+        return db.session.query(Artist).count()
+
+
+@pytest.mark.parametrize('chunk_size', ['0', '-5', '10001', 'many'])
+def test_chunk_size_out_of_range_is_rejected(app, client, chunk_size):
+    before = artist_count(app)
+    response = client.post(f'/import/artists?format=csv&chunk_size={chunk_size}', data=ARTIST_CSV)
+    assert response.status_code == 400
+    assert artist_count(app) == before
+
+
+def test_rejected_rows_are_reported(app, client):
+    before = artist_count(app)
+    body = b'\n'.join([
+        json.dumps(dict(REPORTED_ARTIST, name='Reported Band')).encode(),
+        b'{"name": "Broken',
+        b'["not", "an", "object"]',
+        '{"name": "Caf\u00e9"}'.encode('latin-1'),
+        json.dumps(REPORTED_ARTIST).encode(),
+    ])
+    response = client.post('/import/artists?format=ndjson', data=body)
+
+    assert response.status_code == 422
+    report = response.get_json()
+    assert (report['inserted'], report['rejected'], report['failed_batches']) == (1, 4, 0)
+    assert [error.split(':')[0] for error in report['errors']] == ['row 2', 'row 3', 'row 4', 'row 5']
+    assert 'not valid JSON' in report['errors'][0]
+    assert 'not a JSON object' in report['errors'][1]
+    assert 'not valid UTF-8' in report['errors'][2]
+    assert report['errors'][3].startswith('row 5: name:')
+    assert artist_count(app) == before + 1
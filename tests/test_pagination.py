@@ -0,0 +1,56 @@
+"""Keyset pagination: cursors round-trip and anything else falls back to the first page."""
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from app_config import db
+from models import Artist
+from pagination import encode_cursor, decode_cursor, keyset_page
+from queries import ARTIST_LISTING_ORDER, SHOW_LISTING_ORDER
+
+
+def raw_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+def test_cursor_round_trip():
+    values = [datetime(2024, 5, 1, 20, 30), 7]
+    assert decode_cursor(encode_cursor(values), SHOW_LISTING_ORDER) == values
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor',
+    raw_cursor({"start_time": '2024-05-01T20:30:00', "id": 7}),
+    raw_cursor(['2024-05-01T20:30:00']),
+    raw_cursor(['2024-05-01T20:30:00', 7, 8]),
+    raw_cursor(['yesterday', 7]),
+    raw_cursor(['2024-05-01T20:30:00', '7']),
+    raw_cursor(['2024-05-01T20:30:00', True]),
+], ids=['not-base64', 'object', 'short', 'long', 'bad-datetime', 'string-id', 'bool-id'])
+def test_bad_cursor_is_rejected(cursor):
+    assert decode_cursor(cursor, SHOW_LISTING_ORDER) is None
+
+
+def test_pages_cover_the_listing_once(app):
+    with app.app_context():
+        expected = [row.id for row in db.session.query(Artist.id).order_by(Artist.id)]
+
+        pages = [keyset_page(db.session.query(Artist), ARTIST_LISTING_ORDER, limit=7)]
+        while pages[-1].next_cursor:
+            pages.append(keyset_page(db.session.query(Artist), ARTIST_LISTING_ORDER,
+                                     after=pages[-1].next_cursor, limit=7))
+        assert [artist.id for page in pages for artist in page.rows] == expected
+
+        # Stepping back from the second page lands on the first one again
+        back = keyset_page(db.session.query(Artist), ARTIST_LISTING_ORDER, before=pages[1].prev_cursor, limit=7)
+        assert [artist.id for artist in back.rows] == [artist.id for artist in pages[0].rows]
+        assert back.prev_cursor is None
+
+
+def test_listing_ignores_bad_cursor(client):
+    first = client.get('/artists')
+    response = client.get('/artists?after=' + raw_cursor(['Oslo', 7]))
+    assert response.status_code == 200
+    assert response.headers['ETag'] == first.headers['ETag']
@@ -0,0 +1,53 @@
+"""Every view with a @query_budget stays within it; over budget raises while the app is testing."""
+import pytest
+from flask import url_for
+
+from app_config import db
+from models import Venue, Artist
+from query_stats import QueryBudgetExceeded
+
+
+def budgeted_rules(app):
+    for rule in sorted(app.url_map.iter_rules(), key=lambda rule: rule.rule):
+        budget = getattr(app.view_functions[rule.endpoint], 'query_budget', None)
+        if budget is not None:
+            yield rule, budget
+
+
+def request_for(app, rule):
+    with app.app_context():
+        values = {
+            'venue_id': db.session.query(Venue.id).order_by(Venue.id).first().id,
+            'artist_id': db.session.query(Artist.id).order_by(Artist.id).first().id,
+        }
+    with app.test_request_context():
+        path = url_for(rule.endpoint, **{name: values[name] for name in rule.arguments})
+    if 'GET' in rule.methods:
+        return 'GET', path, None
+    return 'POST', path, {'search_term': 'a'}
+
+
+def test_every_budgeted_route_is_covered(app):
+    endpoints = {rule.endpoint for rule, _ in budgeted_rules(app)}
+    assert {'main.venues', 'main.show_venue', 'main.artists', 'main.show_artist', 'main.shows',
+            'main.search_venues', 'main.search_artists', 'main.create_shows'} <= endpoints
+
+
+def test_routes_stay_within_their_budgets(app, client):
+    # Several requests in one app context, as in a test suite: counts must not carry over
+    with app.app_context():
+        for rule, budget in budgeted_rules(app):
+            method, path, data = request_for(app, rule)
+            for _ in range(3):
+                response = client.open(path, method=method, data=data)
+                assert response.status_code == 200, path
+                assert int(response.headers['X-Query-Count']) <= budget, path
+
+
+def test_over_budget_fails_while_testing(app, client, monkeypatch):
+    view = app.view_functions['main.show_venue']
+    monkeypatch.setattr(view, 'query_budget', 0, raising=False)
+    method, path, _ = request_for(app, next(rule for rule, _ in budgeted_rules(app)
+                                            if rule.endpoint == 'main.show_venue'))
+    with pytest.raises(QueryBudgetExceeded):
+        client.open(path, method=method)
@@ -0,0 +1,34 @@
+"""In-process ngram search: the index follows writes made without ORM events."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app_config import db
+from models import Venue, Artist, Show
+
+
+def search_venues(client, term):
+    return client.post('/venues/search', data={'search_term': term}).get_data(as_text=True)
+
+
+@pytest.mark.parametrize('inline_shows', [1000, 0], ids=['deleted', 'soft-deleted'])
+def test_deleted_venue_leaves_search_results(app, client, monkeypatch, inline_shows):
+    name = f'Quixotic Hall {inline_shows}'
+    with app.app_context():
+        venue = Venue(name=name, city='Oslo', state='NY')
+        db.session.add(venue)
+        db.session.flush()
+        artist_id = db.session.query(Artist.id).order_by(Artist.id).first().id
+        db.session.add(Show(venue_id=venue.id, artist_id=artist_id, start_time=datetime.utcnow() + timedelta(days=1)))
+        db.session.commit()
+        venue_id = venue.id
+
+    assert name in search_venues(client, 'Quixotic')
+
+    # With no shows allowed inline, the venue is soft-deleted by a bulk UPDATE
+    monkeypatch.setitem(app.config, 'VENUE_DELETE_INLINE_SHOWS', inline_shows)
+    assert client.delete(f'/venues/{venue_id}').status_code in (202, 204)
+
+    page = search_venues(client, 'Quixotic')
+    assert name not in page
+    assert 'Number of search results for "Quixotic": 0' in ' '.join(page.split())
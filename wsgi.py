@@ -0,0 +1,23 @@
+"""WSGI entry point for production: ``gunicorn wsgi:app``, configured by gunicorn.conf.py.
+
+Importing this module builds the app and warms it up.  With ``preload_app`` that happens once in the gunicorn
+master, and every worker forked from it starts with compiled templates and babel's locale data
+already in memory, shared copy-on-write.
+"""
+from datetime import datetime
+
+from app import create_app, format_datetime, DATETIME_FORMATS
+
+
+def warm_up(app):
+    # Compiled templates stay in the Jinja environment's cache; outside debug they are never re-checked
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+
+    # Compiles each date pattern and makes babel load the locale data it formats with
+    for format in DATETIME_FORMATS:
+        format_datetime(datetime(2000, 1, 1, 20, 0), format)
+
+
+app = create_app()
+warm_up(app)